@@ -1,11 +1,20 @@
 import sys
+import math
 import logging
-import datetime
 from time import sleep
 from time import time
 
 from lib import api_caller as caller
 from lib import constants as c
+from lib.enums import StatusCode, OrderType
+from lib.portfolio import Portfolio
+from lib.records import Records, to_unixtime
+from lib.order_tracker import OrderTracker
+from lib.market_data import MarketDataPublisher, MarketDataReader
+from lib.scheduler import RequestScheduler
+from lib.hedging import RequestHedger
+from lib.transport import RecordingTransport, ReplayTransport
+from lib.api_caller import set_scheduler, set_hedger, set_transport
 from enum import Enum
 
 
@@ -18,35 +27,6 @@ logging.basicConfig(
 )
 
 
-class StatusCode(Enum):
-    UNKNOWN_ERROR = 1
-    CORRESPONDENCE_REQUIRED = 102
-    RESOURCE_NOT_FOUND = 103
-    AUTHENTICATION_ERROR = 1001
-    INVALID_TRANSACTION = 1009
-    INVALID_DATA = 1000
-    OK = 0
-    RECAPTCHA_ERROR = 1010
-    EMAIL_TAKEN = 1003
-    MISSING_DATA = 1002
-    REQUEST_TOO_LARGE = 1008
-    ACTION_FAILED = 11
-    SERVER_PREVENTED_ACTION = 104
-    TRANSACTION_DID_NOT_SETTLE = 105
-    MAINTENANCE = 1005
-    NOT_IMPLEMENTED = 1004
-    WRONG_PROTOCOL = 100
-    INVALID_ACTION = 10
-    RATE_LIMIT = 101
-    INSUFFICIENT_FUNDS = 106
-    AMOUNT_TO_SMALL = 107
-    IDENTITY_NOT_VERIFIED = 1007
-    ACCOUNT_LOCKED = 1006
-    
-class OrderType(Enum):
-    BUY = 0
-    SELL = 1
-    
 class Times(Enum):
     SEC = 1
     MIN = 60
@@ -62,6 +42,8 @@ class API:
     # public interface
     def __init__(self, tkn):
         self.__tkn = tkn
+        self.__market_ids = {}
+        self.__books = {}
 
     def get_supported_currencies(self):                   
         """Get all the currencies of the Yora platform
@@ -136,27 +118,9 @@ class API:
             Dictionary of market information accessed via dictname['ticker']['info']
         """
 
-        response = self.__get_markets(self.__tkn)
-        self.__check_http_code(response)
-        
-        status_code = response.get('data').get('status_code')
-        if status_code != StatusCode.OK.value:
-            return status_code, None
+        return self.__fetch_markets()
 
-        markets = {}
-        for mkt in response.get('data').get('response'):
-            markets[mkt.get('ticker')] = {
-                'change' : mkt.get('change'),
-                'currency' : mkt.get('currency'),
-                'market_id' : mkt.get('market_id'),
-                'price' : mkt.get('price'),
-                'price_max' : mkt.get('price_max'),
-                'price_min' : mkt.get('price_min'),
-                'vol' : mkt.get('vol')
-            }
-        return status_code, markets
 
-    
     def get_order_book(self, market):               
         """Get the current market orders
 
@@ -173,25 +137,11 @@ class API:
             Indexed dictionary of all the orders on the market accessed via dictname['buy'][ordernum]['info'] or dictname['sell'][ordernum]['info']
         """
 
-        response = {}
-        if isinstance(market, int):
-            response = self.__get_market_orders(self.__tkn, market)
-        elif isinstance(market, str):
-            markets = self.get_markets()
-            if markets[0] != StatusCode.OK.value:
-                return markets[0], None
-            m_id = markets[1][market]['market_id']
-            response = self.__get_market_orders(self.__tkn, m_id)
-        
-        self.__check_http_code(response)
-        
-        status_code = response.get('data').get('status_code')
+        status_code, m_id = self.__market_id(market)
         if status_code != StatusCode.OK.value:
             return status_code, None
-  
-        
-        orders = response.get('data').get('response')
-        return status_code, orders
+
+        return self.__fetch_order_book(m_id)
 
 
     def get_order_history(self, page=None):      
@@ -207,7 +157,8 @@ class API:
         status_code : int
             Status code of response, 0 on success
         own_orders : dict or None
-            Indexed dictionary of all the users orders (open and closed) accessed by dictname['open'][ordernum]['info'] or dictname['closed'][ordernum]['info']
+            Dictionary of Records of all the users orders (open and closed) accessed by dictname['open'][ordernum]['info'] or dictname['closed'][ordernum]['info'],
+            time fields are converted to datetime when accessed
         """
 
         response = self.__get_self_orders(self.__tkn, page)
@@ -218,13 +169,9 @@ class API:
             return status_code, None
 
 
-        own_orders = response.get('data').get('response')  
-        for i in range(len(own_orders.get('open'))):
-            own_orders['open'][i]['time_created'] = self.__unixtime_to_datetime(own_orders.get('open').get(i).get('time_created')) 
-
-        for i in range(len(own_orders.get('closed'))):
-            own_orders[i]['time_created'] = self.__unixtime_to_datetime(own_orders.get('closed').get(i).get('time_created') / 1000)           # CHECK THIS FOR UNIXTIME
-            own_orders[i]['time_completed'] = self.__unixtime_to_datetime(own_orders.get('closed').get(i).get('time_completed') / 1000)       # CHECK THIS FOR UNIXTIME
+        own_orders = response.get('data').get('response')
+        own_orders['open'] = Records(own_orders.get('open'), ('time_created',))
+        own_orders['closed'] = Records(own_orders.get('closed'), ('time_created', 'time_completed'), scale=1000)       # CHECK THIS FOR UNIXTIME
 
         return status_code, own_orders       
 
@@ -251,19 +198,17 @@ class API:
             Dictionary containing the trade ID and transaction ID accessed by dictname['trade_id'] or dictname['tx_id']
         """
 
-        m_id = 0
-        dirct = 0
-        if isinstance(market, int):
-            m_id = market
-        elif isinstance(market, str):
-            markets = self.get_markets()
-            if markets[0] != StatusCode.OK.value:
-                return markets[0], None
-            m_id = markets[1][market]['market_id']
+        # a ticker missing from the cache is looked up as part of the order, ahead of market data
+        status_code, m_id = self.__market_id(market, c.PRIORITY_ORDER)
+        if status_code != StatusCode.OK.value:
+            return status_code, None
+
+        dirct = direction.value if isinstance(direction, OrderType) else direction
 
         response = self.__make_trade(self.__tkn, m_id, dirct, amount, price)
+        self.__books.pop(m_id, None)
         self.__check_http_code(response)
-        
+
         status_code = response.get('data').get('status_code')
         if status_code != StatusCode.OK.value:
             return status_code, None
@@ -271,65 +216,64 @@ class API:
         return status_code, response.get('data').get('response')
 
 
-    def simple_buy(self, market, to_spend):
+    def simple_buy(self, market, to_spend, max_age=c.BOOK_MAX_AGE):
         """Instantly buy or put a trade on market for a desired currency
 
+            The order book is walked until the whole amount is spent, and a single order for
+            to_spend / price is placed at the price of the deepest level needed, so no more than
+            to_spend is committed. The vwap and slippage are estimates from the book, the order
+            fills at the prices on the book when it arrives. When the market ID and a book
+            younger than max_age are already cached, only the trade request is sent.
+
             Parameters
             ----------
             market : str or int
                 The ticker for the market, eg. 'GRC/AUD'
             to_spend : float
                 The amount of money to spend on the purchase
+            max_age : float, optional
+                How old in seconds a cached order book may be before it is fetched again
 
             Returns
             -------
             status_code : int
                 Status code of response, 0 on success
             response : dict or None
-                Dictionary containing the trade ID and transaction ID accessed by dictname['trade_id'] or dictname['tx_id']
+                Dictionary containing the trade ID and transaction ID accessed by dictname['trade_id'] or dictname['tx_id'],
+                along with the order 'price' and 'amount', and the expected 'vwap' and 'slippage'
             """
 
-        price_to_use = get_order_book(market)
-        price = price_to_use['sell'][0]['price']
-        amnt = to_spend / price
-
-        response = trade(market, OrderType.BUY.value, amnt, price)
-        
-        status_code = response[0]
-        if status_code != StatusCode.OK.value:
-            return status_code, None
-
-        return status_code, response
+        return self.__market_order(market, OrderType.BUY, to_spend, max_age)
 
 
-    def simple_sell(self, market, to_sell):
+    def simple_sell(self, market, to_sell, max_age=c.BOOK_MAX_AGE):
         """Instantly sell or put a trade on market for a desired currency
 
+            The order book is walked until the whole amount is sold, and a single order for
+            to_sell is placed at the price of the deepest level needed. The vwap and slippage
+            are estimates from the book, the order fills at the prices on the book when it
+            arrives. When the market ID and a book younger than max_age are already cached,
+            only the trade request is sent.
+
             Parameters
             ----------
             market : str or int
                 The ticker for the market, eg. 'GRC/AUD'
             to_sell : float
                 The amount of the currency, eg. BTC, to sell
+            max_age : float, optional
+                How old in seconds a cached order book may be before it is fetched again
 
             Returns
             -------
             status_code : int
                 Status code of response, 0 on success
             response : dict or None
-                Dictionary containing the trade ID and transaction ID accessed by dictname['trade_id'] or dictname['tx_id']
+                Dictionary containing the trade ID and transaction ID accessed by dictname['trade_id'] or dictname['tx_id'],
+                along with the order 'price' and 'amount', and the expected 'vwap' and 'slippage'
             """
 
-        price_to_use = get_order_book(market)
-        price = price_to_use['buy'][0]['price']
-
-        response = self.trade(market, OrderType.SELL.value, to_sell, price)
-        
-        status_code = response[0]
-        if status_code != StatusCode.OK.value:
-            return status_code, None
-
-        return status_code, response
+        return self.__market_order(market, OrderType.SELL, to_sell, max_age)
 
 
     def cancel_trade(self, trade_id):
@@ -347,6 +291,8 @@ class API:
         """
 
         response = self.__cancel_trade(self.__tkn, trade_id)
+        # the market of the cancelled order is not known, so every cached book is dropped
+        self.__books.clear()
         self.__check_http_code(response)
 
         status_code = response.get('data').get('status_code')
@@ -399,14 +345,9 @@ class API:
             Current price of the market
         """
 
-        m_id = 0
-        if isinstance(market, int):
-            m_id = market
-        elif isinstance(market, str):
-            markets = self.get_markets()
-            if markets[0] != StatusCode.OK.value:
-                return markets[0], None
-            m_id = markets[1][market]['market_id']
+        status_code, m_id = self.__market_id(market)
+        if status_code != StatusCode.OK.value:
+            return status_code, None
         
         response = self.__get_price(m_id)
         self.__check_http_code(response)
@@ -526,18 +467,14 @@ class API:
         -------
         status_code : int
             Status code of response, 0 on success
-        candles : dict or None
-            Indexed dictionary of candle sticks accessed by dictname[index]['info'] or dictname[index] to get the entire candle
+        candles : Records or None
+            Indexed candle sticks accessed by dictname[index]['info'] or dictname[index] to get the entire candle,
+            the 'time' field is converted to datetime when accessed
         """
 
-        m_id = 0
-        if isinstance(market, int):
-            m_id = market
-        elif isinstance(market, str):
-            markets = self.get_markets()
-            if markets[0] != StatusCode.OK.value:
-                return markets[0], None
-            m_id = markets[1][market]['market_id']
+        status_code, m_id = self.__market_id(market)
+        if status_code != StatusCode.OK.value:
+            return status_code, None
 
         ft = 0
         if isinstance(from_time, int):
@@ -558,10 +495,7 @@ class API:
         if status_code != StatusCode.OK.value:
             return status_code, None
 
-        candles = response.get('data').get('response').get('candles')
-        for i in range(len(candles)):
-            candles[i]['time'] = self.__unixtime_to_datetime(candles.get(i).get('time') / 1000)         # CHECK THIS FOR UNIXTIME
-
+        candles = Records(response.get('data').get('response').get('candles'), ('time',), scale=1000)         # CHECK THIS FOR UNIXTIME
         return status_code, candles       # indexed
 
 
@@ -581,38 +515,33 @@ class API:
         -------
         status_code : int
             Status code of response, 0 on success
-        candles : dict or None
-            Indexed dictionary of candle sticks accessed by dictname[index]['info'] or dictname[index] to get the entire candle
+        candle : Record or None
+            The candle stick starting at the requested time accessed by dictname['info'],
+            the 'time' field is converted to datetime when accessed
         """
 
-        m_id = 0
-        if isinstance(market, int):
-            m_id = market
-        elif isinstance(market, str):
-            markets = self.get_markets()
-            if markets[0] != StatusCode.OK.value:
-                return markets[0], None
-            m_id = markets[1][market]['market_id']
+        status_code, m_id = self.__market_id(market)
+        if status_code != StatusCode.OK.value:
+            return status_code, None
 
         at = 0
         if isinstance(at_time, int):
-            at = from_time
+            at = at_time
         elif isinstance(at_time, str):
-            at = self.__datetime_to_unixtime(at_time)  
+            at = self.__datetime_to_unixtime(at_time)
 
-        response = self.__get_chart(self.__tkn, m_id, interval, ft, tt, page)
+        response = self.__get_chart(self.__tkn, m_id, interval, at, at + interval, page)
         self.__check_http_code(response)
         
         status_code = response.get('data').get('status_code')
         if status_code != StatusCode.OK.value:
             return status_code, None
 
-        candles = response.get('data').get('response').get('candles')
-        for i in range(len(candles)):
-            if self.__datetime_to_unixtime(candles.get(i).get('time') / 1000) == at:
-                return status_code, candles[i]
-            else:
-                return status_code, None
+        candles = Records(response.get('data').get('response').get('candles'), ('time',), scale=1000)         # CHECK THIS FOR UNIXTIME
+        matching = candles.between(at, at + 1)
+        if len(matching) == 0:
+            return status_code, None
+        return status_code, matching[0]
 
 
     def market_history(self, market, page=0):
@@ -629,18 +558,13 @@ class API:
         -------
         status_code : int
             Status code of response, 0 on success
-        orders : dict or None
-            Indexed dictionary of orders
+        orders : Records or None
+            Indexed orders, the 'time' field is converted to datetime when accessed
         """
 
-        m_id = 0
-        if isinstance(market, int):
-            m_id = market
-        elif isinstance(market, str):
-            markets = self.get_markets()
-            if markets[0] != StatusCode.OK.value:
-                return markets[0], None
-            m_id = markets[1][market]['market_id']
+        status_code, m_id = self.__market_id(market)
+        if status_code != StatusCode.OK.value:
+            return status_code, None
 
         response = self.__get_market_history(self.__tkn, m_id, page)     
         self.__check_http_code(response)
@@ -649,9 +573,7 @@ class API:
         if status_code != StatusCode.OK.value:
             return status_code, None
 
-        orders = response.get('data').get('response') 
-        for i in range(len(orders)):
-            orders[i]['time'] = self.__unixtime_to_datetime(orders.get(i).get('time') / 1000)         # CHECK THIS FOR UNIXTIME
+        orders = Records(response.get('data').get('response'), ('time',), scale=1000)         # CHECK THIS FOR UNIXTIME
 
         return status_code, orders
 
@@ -665,11 +587,110 @@ class API:
             logging.error("Bad HTTP response: " + str(response.get("http-code")))
             sys.exit(1)
 
+    @staticmethod
     def __datetime_to_unixtime(dt):                         # helper
-        return datetime.datetime.strptime(dt, "%Y-%m-%d %H:%M:%S").timestamp()
+        return to_unixtime(dt)
 
-    def __unixtime_to_datetime(ut):                         # helper
-        return datetime.datetime.fromtimestamp(ut)
+    def __market_id(self, market, priority=None):           # helper
+        if isinstance(market, int):
+            return StatusCode.OK.value, market
+        if market not in self.__market_ids:
+            markets = self.__fetch_markets(priority)
+            if markets[0] != StatusCode.OK.value:
+                return markets[0], None
+        return StatusCode.OK.value, self.__market_ids[market]
+
+    def __fetch_markets(self, priority=None):
+        response = self.__get_markets(self.__tkn, priority)
+        self.__check_http_code(response)
+        
+        status_code = response.get('data').get('status_code')
+        if status_code != StatusCode.OK.value:
+            return status_code, None
+
+        markets = {}
+        for mkt in response.get('data').get('response'):
+            self.__market_ids[mkt.get('ticker')] = mkt.get('market_id')
+            markets[mkt.get('ticker')] = {
+                'change' : mkt.get('change'),
+                'currency' : mkt.get('currency'),
+                'market_id' : mkt.get('market_id'),
+                'price' : mkt.get('price'),
+                'price_max' : mkt.get('price_max'),
+                'price_min' : mkt.get('price_min'),
+                'vol' : mkt.get('vol')
+            }
+        return status_code, markets
+
+
+    def __fetch_order_book(self, m_id, priority=None):
+        response = self.__get_market_orders(self.__tkn, m_id, priority)
+        self.__check_http_code(response)
+
+        status_code = response.get('data').get('status_code')
+        if status_code != StatusCode.OK.value:
+            return status_code, None
+
+        orders = response.get('data').get('response')
+        self.__books[m_id] = (time(), orders)
+        return status_code, orders
+
+
+    def __book_levels(self, side):                          # helper
+        rows = side.values() if isinstance(side, dict) else (side or [])
+        return [(float(row.get('price')), float(row.get('amount'))) for row in rows]
+
+
+    def __market_order(self, market, direction, quantity, max_age):
+        status_code, m_id = self.__market_id(market, c.PRIORITY_ORDER)
+        if status_code != StatusCode.OK.value:
+            return status_code, None
+
+        cached = self.__books.get(m_id)
+        if cached is not None and time() - cached[0] <= max_age:
+            orders = cached[1]
+        else:
+            status_code, orders = self.__fetch_order_book(m_id, c.PRIORITY_ORDER)
+            if status_code != StatusCode.OK.value:
+                return status_code, None
+
+        buying = direction == OrderType.BUY
+        levels = sorted(self.__book_levels(orders.get('sell' if buying else 'buy')), reverse=not buying)
+        if not levels:
+            logging.warning('No orders on market %s to fill against', market)
+            return StatusCode.RESOURCE_NOT_FOUND.value, None
+
+        # walk the book until the whole quantity (quote for buys, base for sells) is used up
+        remaining = quantity
+        filled = 0.0
+        cost = 0.0
+        for price, amount in levels:
+            level_size = price * amount if buying else amount
+            take = min(level_size, remaining)
+            filled += take / price if buying else take
+            cost += take if buying else take * price
+            remaining -= take
+            limit = price
+            if remaining <= 0:
+                break
+
+        # the whole order is placed at the deepest price used, so buys are sized at that
+        # price to never commit more than to_spend, anything unfilled rests on the book
+        amount = quantity / limit if buying else quantity
+        while buying and amount * limit > quantity:
+            # the division can round up, which would commit a fraction more than to_spend
+            amount = math.nextafter(amount, 0.0)
+        best = levels[0][0]
+        vwap = cost / filled if filled else limit
+        slippage = (vwap - best) / best if buying else (best - vwap) / best
+
+        response = self.trade(m_id, direction, amount, limit)
+        if response[0] != StatusCode.OK.value:
+            return response[0], None
+
+        details = dict(response[1] or {})
+        details.update({'price' : limit, 'amount' : amount, 'vwap' : vwap, 'slippage' : slippage})
+        return response[0], details
 
 
     def __get_currencies(self, token):
@@ -680,16 +701,17 @@ class API:
         return caller.api_call_get('balances', payload={'token' : token})
 
     
-    def __get_markets(self, token):
-        return caller.api_call_get('markets', payload={'token' : token})
+    def __get_markets(self, token, priority=None):
+        return caller.api_call_get('markets', payload={'token' : token}, priority=priority)
 
     
-    def __get_market_orders(self, token, market):
+    def __get_market_orders(self, token, market, priority=None):
         return caller.api_call_get('marketorders',
             payload={
                 'token' : token,
                 'market_id' : market
-            }
+            },
+            priority=priority
         )
 
     
@@ -1 +1,10 @@
+from . import enums
 from . import api_caller
+from . import portfolio
+from . import records
+from . import order_tracker
+from . import market_data
+from . import export
+from . import scheduler
+from . import hedging
+from . import transport
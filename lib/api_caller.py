@@ -3,15 +3,72 @@ import requests
 import json
 
 from . import constants as c
+from .enums import StatusCode
 
 
-def api_call_post(endpoint: str, payload: dict, user_agent: str=c.DEFAULT_USER_AGENT, host: str=c.HOST):
+_transport = requests
+_scheduler = None
+_hedger = None
+
+
+def set_transport(transport):
+    """Send requests through another transport, eg. a RecordingTransport, or through requests again when given None"""
+    global _transport
+    _transport = requests if transport is None else transport
+
+
+def set_scheduler(scheduler):
+    """Send every request through a RequestScheduler, or directly again when given None"""
+    global _scheduler
+    _scheduler = scheduler
+
+
+def set_hedger(hedger):
+    """Hedge slow GET requests with a RequestHedger, or stop hedging when given None"""
+    global _hedger
+    _hedger = hedger
+
+
+def api_call_post(endpoint: str, payload: dict, user_agent: str=c.DEFAULT_USER_AGENT, host: str=c.HOST, priority: int=None, deadline: float=None):
+    return _respond(endpoint, _attempt(_post, endpoint, payload, user_agent, host, priority, deadline))
+
+
+def api_call_get(endpoint: str, payload: dict, user_agent: str=c.DEFAULT_USER_AGENT, host: str=c.HOST, priority: int=None, deadline: float=None):
+    if _hedger is not None and _hedger.applies(endpoint):
+        result = _hedger.call(_get, _attempt, endpoint, payload, user_agent, host, priority, deadline)
+    else:
+        result = _attempt(_get, endpoint, payload, user_agent, host, priority, deadline)
+    return _respond(endpoint, result)
+
+
+def _attempt(send, endpoint, payload, user_agent, host, priority, deadline):
+    # sends one request, through the scheduler when one is set, None if the scheduler dropped it
+    if _scheduler is None:
+        return send(endpoint, payload, user_agent, host)
+
+    if priority is None:
+        priority = c.ENDPOINT_PRIORITY.get(endpoint.rstrip('/').rsplit('/', 1)[-1], c.PRIORITY_MARKET_DATA)
+    return _scheduler.call(priority, send, endpoint, payload, user_agent, host, deadline=deadline)
+
+
+def _respond(endpoint, result):
+    if result is None:
+        # dropped requests look like a rate limited response so callers handle them by status code
+        logging.warning('Request to %s dropped by the scheduler', endpoint)
+        return {
+            'http-code' : 200,
+            'data' : {'status_code' : StatusCode.RATE_LIMIT.value, 'response' : None}
+        }
+    return result
+
+
+def _post(endpoint, payload, user_agent, host):
     endpoint = endpoint if endpoint.startswith('http') else host + endpoint
 
     logging.info('POST - Connecting to endpoint %s', endpoint)
     logging.info('Using payload: %s', payload)
 
-    r = requests.post(
+    r = _transport.post(
         endpoint,
         json=payload,
         headers= None if user_agent is None else {'User-Agent' : user_agent}
@@ -35,13 +92,13 @@ def api_call_post(endpoint: str, payload: dict, user_agent: str=c.DEFAULT_USER_A
     }
 
 
-def api_call_get(endpoint: str, payload: dict, user_agent: str=c.DEFAULT_USER_AGENT, host: str=c.HOST):
+def _get(endpoint, payload, user_agent, host):
     endpoint = endpoint if endpoint.startswith('http') else host + endpoint
 
     logging.info('GET - Connecting to endpoint %s', endpoint)
     logging.info('Using payload: %s', payload)
 
-    r = requests.get(
+    r = _transport.get(
         endpoint,
         params=payload,
         headers= None if user_agent is None else {'User-Agent' : user_agent}
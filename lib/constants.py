@@ -6,3 +6,45 @@ LOG_DATE_FMT = '%m-%d %H:%M:%S'
 
 HOST = 'https://api.yora.tech/'
 DEFAULT_USER_AGENT = 'Python Yora Library'
+
+DEFAULT_QUOTE_CURRENCY = 'AUD'
+PORTFOLIO_RESUM_INTERVAL = 1000
+
+BOOK_MAX_AGE = 2.0
+ORDER_RECONCILE_INTERVAL = 30.0
+MARKET_DATA_SHM_NAME = 'yora_market_data'
+MARKET_DATA_READ_RETRIES = 10000
+
+EXPORT_WORKERS = 4
+EXPORT_RATE = 5.0
+EXPORT_CHUNK_SIZE = 10000
+EXPORT_WINDOW = 1000
+
+PRIORITY_ORDER = 0
+PRIORITY_ACCOUNT = 1
+PRIORITY_MARKET_DATA = 2
+ENDPOINT_PRIORITY = {
+    'trade' : PRIORITY_ORDER,
+    'canceltrade' : PRIORITY_ORDER,
+    'balances' : PRIORITY_ACCOUNT,
+    'orders' : PRIORITY_ACCOUNT,
+    'address' : PRIORITY_ACCOUNT,
+    'withdraw' : PRIORITY_ACCOUNT,
+    'cancelwithdrawal' : PRIORITY_ACCOUNT
+}
+SCHEDULER_MAX_CONCURRENT = 4
+SCHEDULER_RESERVED_FOR_ORDERS = 2
+SCHEDULER_CLASS_CAPS = {PRIORITY_ORDER : 4, PRIORITY_ACCOUNT : 3, PRIORITY_MARKET_DATA : 2}
+SCHEDULER_DEADLINES = {PRIORITY_ORDER : None, PRIORITY_ACCOUNT : None, PRIORITY_MARKET_DATA : 2.0}
+
+HEDGE_ENDPOINTS = ('marketorders', 'price')
+HEDGE_PERCENTILE = 95
+HEDGE_BUDGET = 0.05
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 500
+HEDGE_WORKERS = 8
+
+REDACTED = '<redacted>'
+REDACTED_FIELDS = ('token',)
+CAPTURE_FLUSH_LINES = 100
+CAPTURE_FLUSH_INTERVAL = 1.0
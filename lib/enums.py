@@ -0,0 +1,31 @@
+from enum import Enum
+
+
+class StatusCode(Enum):
+    UNKNOWN_ERROR = 1
+    CORRESPONDENCE_REQUIRED = 102
+    RESOURCE_NOT_FOUND = 103
+    AUTHENTICATION_ERROR = 1001
+    INVALID_TRANSACTION = 1009
+    INVALID_DATA = 1000
+    OK = 0
+    RECAPTCHA_ERROR = 1010
+    EMAIL_TAKEN = 1003
+    MISSING_DATA = 1002
+    REQUEST_TOO_LARGE = 1008
+    ACTION_FAILED = 11
+    SERVER_PREVENTED_ACTION = 104
+    TRANSACTION_DID_NOT_SETTLE = 105
+    MAINTENANCE = 1005
+    NOT_IMPLEMENTED = 1004
+    WRONG_PROTOCOL = 100
+    INVALID_ACTION = 10
+    RATE_LIMIT = 101
+    INSUFFICIENT_FUNDS = 106
+    AMOUNT_TO_SMALL = 107
+    IDENTITY_NOT_VERIFIED = 1007
+    ACCOUNT_LOCKED = 1006
+    
+class OrderType(Enum):
+    BUY = 0
+    SELL = 1
@@ -0,0 +1,302 @@
+import os
+import csv
+import json
+import logging
+import threading
+from time import sleep
+from time import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import constants as c
+from .enums import StatusCode
+
+
+class ExportError(Exception):
+    """Raised by an export job when a request fails, holding the status code of the response"""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class RateLimiter:
+    """Thread safe limit on the number of requests per second shared by all export workers"""
+
+    def __init__(self, rate):
+        self.__interval = 1.0 / rate
+        self.__next = 0.0
+        self.__lock = threading.Lock()
+
+    def acquire(self):
+        with self.__lock:
+            now = time()
+            wait = self.__next - now
+            self.__next = max(now, self.__next) + self.__interval
+        if wait > 0:
+            sleep(wait)
+
+
+class Checkpoint:
+    """Progress of every export job and the time range it covers, saved to a json file after each written chunk"""
+
+    def __init__(self, path):
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.__jobs = {}
+        self.range = None
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            self.range = saved.get('range')
+            self.__jobs = saved.get('jobs', {})
+
+    def get(self, key):
+        with self.__lock:
+            return dict(self.__jobs.get(key, {}))
+
+    def save(self, key, state):
+        with self.__lock:
+            self.__jobs[key] = state
+            tmp = self.__path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump({'range' : self.range, 'jobs' : self.__jobs}, f, indent=1)
+            os.replace(tmp, self.__path)
+
+
+class CsvWriter:
+    """Appends rows to a single csv file, truncating anything written after the last checkpoint"""
+
+    def __init__(self, path, state):
+        self.__path = path
+        self.__fields = state.get('fields')
+        size = state.get('size', 0)
+        if os.path.exists(path):
+            with open(path, 'r+b') as f:
+                f.truncate(size)
+        elif size:
+            raise FileNotFoundError('Checkpointed output %s is missing' % path)
+
+    def write(self, rows):
+        if not rows:
+            return
+        with open(self.__path, 'a', newline='') as f:
+            if self.__fields is None:
+                self.__fields = list(rows[0])
+            writer = csv.DictWriter(f, fieldnames=self.__fields, extrasaction='ignore')
+            if f.tell() == 0:
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def state(self):
+        size = os.path.getsize(self.__path) if os.path.exists(self.__path) else 0
+        return {'fields' : self.__fields, 'size' : size}
+
+
+class ParquetWriter:
+    """Writes each chunk of rows to its own numbered parquet file in a directory"""
+
+    def __init__(self, path, state):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError('Parquet output requires pyarrow, install it or use the csv format')
+        self.__pa = pyarrow
+        self.__path = path
+        self.__part = state.get('part', 0)
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, rows):
+        if not rows:
+            return
+        table = self.__pa.Table.from_pylist(rows)
+        self.__pa.parquet.write_table(table, os.path.join(self.__path, 'part-%05d.parquet' % self.__part))
+        self.__part += 1
+
+    def state(self):
+        return {'part' : self.__part}
+
+
+WRITERS = {
+    'csv' : (CsvWriter, '.csv'),
+    'parquet' : (ParquetWriter, '')
+}
+
+
+def candle_pages(api, limiter, market_id, interval, from_time, to_time, position, window=c.EXPORT_WINDOW):
+    """Yield every page of candles between two times along with the position after it
+
+    The range is split into windows of window candles which are paged through in turn,
+    so position is a [window, page] pair.
+    """
+
+    index, page = position
+    span = interval * window
+    while from_time + index * span < to_time:
+        start = from_time + index * span
+        previous = None
+        while True:
+            limiter.acquire()
+            status_code, candles = api.get_chart(market_id, interval, start, min(start + span, to_time), page)
+            if status_code != StatusCode.OK.value:
+                raise ExportError(status_code, 'get_chart failed with status %s' % status_code)
+            rows = list(getattr(candles, 'raw', candles) or [])
+            # an empty page, or a repeat of the last one, ends the window
+            if not rows or rows[0] == previous:
+                break
+            previous = rows[0]
+            page += 1
+            yield rows, [index, page]
+        index, page = index + 1, 0
+        yield [], [index, page]
+
+
+def trade_pages(api, limiter, market_id, position):
+    """Yield every new row of the market history, a page at a time, along with the position after it
+
+    The history lists the newest trades first, so trades made since a page was read push
+    rows onto later pages. The position is a [page, time, rows] triple holding the time of
+    the oldest trade exported and the rows exported at that time, and rows at or after it
+    are skipped, so a resumed export neither repeats nor misses trades.
+    """
+
+    page, last_time, last_rows = position
+    previous = None
+    while True:
+        limiter.acquire()
+        status_code, orders = api.market_history(market_id, page)
+        if status_code != StatusCode.OK.value:
+            raise ExportError(status_code, 'market_history failed with status %s' % status_code)
+        rows = list(getattr(orders, 'raw', orders) or [])
+        if not rows or rows[0] == previous:
+            return
+        previous = rows[0]
+        page += 1
+
+        new = []
+        for row in rows:
+            if last_time is not None and (row['time'] > last_time or (row['time'] == last_time and row in last_rows)):
+                continue
+            if row['time'] != last_time:
+                last_time, last_rows = row['time'], []
+            last_rows.append(row)
+            new.append(row)
+        yield new, [page, last_time, list(last_rows)]
+
+
+def run_job(key, pages, start, writer, checkpoint, chunk_size, stop=None):
+    """Stream the pages of one job to its writer, checkpointing after every chunk until stop is set"""
+
+    buffer = []
+    position = start
+    for rows, position in pages:
+        buffer.extend(rows)
+        if len(buffer) >= chunk_size:
+            writer.write(buffer)
+            buffer = []
+            checkpoint.save(key, {'position' : position, 'done' : False, 'writer' : writer.state()})
+            if stop is not None and stop.is_set():
+                return None
+
+    writer.write(buffer)
+    checkpoint.save(key, {'position' : position, 'done' : True, 'writer' : writer.state()})
+    logging.info('Export of %s finished', key)
+    return key
+
+
+def export(api, markets, intervals, from_time, to_time, out_dir, fmt='csv', trades=True,
+           workers=c.EXPORT_WORKERS, rate=c.EXPORT_RATE, chunk_size=c.EXPORT_CHUNK_SIZE):
+    """Export the candle and trade history of several markets, resuming any earlier run in out_dir
+
+    Parameters
+    ----------
+    api : Yora.API
+        The API object used to fetch the history
+    markets : list of str
+        The tickers of the markets to export, eg. ['GRC/AUD']
+    intervals : list of int
+        The candle intervals in seconds, use the constants Yora.Times.MIN.value, ...
+    from_time : int
+        The unix time to export candles from
+    to_time : int or None
+        The unix time to export candles to, None for the end of the interrupted run in out_dir or now
+    out_dir : str
+        The directory the files and the checkpoint are written to
+    fmt : str, optional
+        The output format, 'csv' or 'parquet'
+    trades : bool, optional
+        Whether the market history is exported along with the candles
+    workers : int, optional
+        The number of jobs fetched at the same time
+    rate : float, optional
+        The maximum number of requests per second across all workers
+    chunk_size : int, optional
+        The number of rows buffered before they are written and checkpointed
+
+    Returns
+    -------
+    status_code : int
+        Status code of the first failing request, 0 on success
+    finished : list of str or None
+        The names of the jobs exported by this run, None if a request failed
+
+    Raises
+    ------
+    ValueError
+        If a market does not exist, or out_dir holds an export of a different time range
+    """
+
+    os.makedirs(out_dir, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(out_dir, 'checkpoint.json'))
+    if to_time is None:
+        to_time = checkpoint.range[1] if checkpoint.range is not None else int(time())
+    if checkpoint.range is None:
+        checkpoint.range = [from_time, to_time]
+    elif checkpoint.range != [from_time, to_time]:
+        raise ValueError('%s holds an export from %s to %s, use another output directory for a different range'
+                         % (out_dir, checkpoint.range[0], checkpoint.range[1]))
+
+    status_code, all_markets = api.get_markets()
+    if status_code != StatusCode.OK.value:
+        return status_code, None
+
+    unknown = [ticker for ticker in markets if ticker not in all_markets]
+    if unknown:
+        raise ValueError('Unknown market: ' + ', '.join(unknown))
+    limiter = RateLimiter(rate)
+    writer_type, extension = WRITERS[fmt]
+
+    jobs = []
+    for ticker in markets:
+        m_id = all_markets[ticker]['market_id']
+        name = ticker.replace('/', '-')
+        for interval in intervals:
+            jobs.append(('candles_%s_%d' % (name, interval), [0, 0],
+                         lambda pos, m_id=m_id, interval=interval: candle_pages(api, limiter, m_id, interval, from_time, to_time, pos)))
+        if trades:
+            jobs.append(('trades_%s' % name, [0, None, []],
+                         lambda pos, m_id=m_id: trade_pages(api, limiter, m_id, pos)))
+
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for key, start, pages in jobs:
+            state = checkpoint.get(key)
+            if state.get('done'):
+                logging.info('Export of %s already finished, skipped', key)
+                continue
+            position = state.get('position', start)
+            writer = writer_type(os.path.join(out_dir, key + extension), state.get('writer', {}))
+            futures.append(executor.submit(run_job, key, pages(position), position, writer, checkpoint, chunk_size, stop))
+
+        try:
+            finished = [future.result() for future in futures]
+        except ExportError as e:
+            # jobs that have not started are cancelled, the others stop at their next checkpoint
+            logging.error('Export failed: %s', e)
+            stop.set()
+            for future in futures:
+                future.cancel()
+            return e.status_code, None
+
+    return status_code, finished
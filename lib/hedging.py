@@ -0,0 +1,170 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from time import time
+
+from . import constants as c
+
+
+class RequestHedger:
+    """Sends a second copy of a slow GET request and uses whichever response arrives first
+
+    A duplicate is sent once the first request has been waiting longer than the hedge
+    delay, which is either fixed or the given percentile of the latencies observed for
+    the endpoint. The losing request is left to finish and its response is ignored.
+
+    Every request earns budget hedges and every hedge spends one, so at most about
+    budget * 100 percent of requests are duplicated.
+
+    Parameters
+    ----------
+    endpoints : iterable of str, optional
+        The GET endpoints that may be hedged, they must be safe to send twice
+    delay : float, optional
+        A fixed number of seconds to wait before hedging, uses the observed latency if not given
+    percentile : float, optional
+        The percentile of observed latency used as the delay
+    budget : float, optional
+        The fraction of requests that may be hedged
+    min_samples : int, optional
+        The number of latencies observed for an endpoint before it is hedged without a fixed delay
+    workers : int, optional
+        The number of requests in flight at once through the hedger
+    """
+
+    # public interface
+    def __init__(self, endpoints=c.HEDGE_ENDPOINTS, delay=None, percentile=c.HEDGE_PERCENTILE,
+                 budget=c.HEDGE_BUDGET, min_samples=c.HEDGE_MIN_SAMPLES, workers=c.HEDGE_WORKERS):
+        self.__endpoints = set(endpoints)
+        self.__delay = delay
+        self.__percentile = percentile
+        self.__budget = budget
+        self.__tokens = 1.0
+        self.__min_samples = min_samples
+        self.__executor = ThreadPoolExecutor(max_workers=workers)
+        self.__lock = threading.Lock()
+        self.__latencies = {}
+        self.__stats = {'requests' : 0, 'hedges' : 0, 'hedge_wins' : 0}
+
+
+    def applies(self, endpoint):
+        """Whether requests to this endpoint are hedged"""
+
+        return self.__endpoint_name(endpoint) in self.__endpoints
+
+
+    def call(self, send, attempt, endpoint, *args):
+        """Send a request with attempt(send, endpoint, *args), hedging it if it is slow
+
+        attempt may delay the call to send, eg. while it waits for a scheduler slot, or
+        return None without calling it when the request is dropped. Latency is measured
+        around send alone, and the hedge delay counts from when the first send starts.
+        The hedge goes through attempt as well, so it is limited like any other request.
+        When the request cannot be hedged, attempt is called on the calling thread.
+
+        Returns
+        -------
+        result : object or None
+            The result of whichever attempt answered first, None if every attempt was dropped
+        """
+
+        name = self.__endpoint_name(endpoint)
+        delay = self.__hedge_delay(name)
+        with self.__lock:
+            self.__stats['requests'] += 1
+            self.__tokens = min(self.__tokens + self.__budget, 1.0 + self.__budget)
+            budgeted = self.__tokens >= 1.0
+
+        if delay is None or not budgeted:
+            return attempt(self.__timed(send, name), endpoint, *args)
+
+        started = threading.Event()
+        primary = self.__executor.submit(attempt, self.__timed(send, name, started), endpoint, *args)
+        primary.add_done_callback(lambda f: started.set())
+        started.wait()
+        done, _ = wait([primary], timeout=delay)
+        if done or not self.__take_token():
+            return primary.result()
+
+        hedge = self.__executor.submit(attempt, self.__timed(send, name), endpoint, *args)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                elif future.result() is not None:
+                    if future is hedge:
+                        with self.__lock:
+                            self.__stats['hedge_wins'] += 1
+                    return future.result()
+        if error is not None:
+            raise error
+        return None
+
+
+    def stats(self):
+        """Get how often requests were hedged and how often the hedge answered first
+
+        Returns
+        -------
+        stats : dict
+            Dictionary accessed by dictname['info'], with info being 'requests', 'hedges', 'hedge_wins',
+            'hedge_rate' (hedges per request) or 'win_rate' (hedge wins per hedge)
+        """
+
+        with self.__lock:
+            stats = dict(self.__stats)
+        stats['hedge_rate'] = stats['hedges'] / stats['requests'] if stats['requests'] else 0.0
+        stats['win_rate'] = stats['hedge_wins'] / stats['hedges'] if stats['hedges'] else 0.0
+        return stats
+
+
+    def close(self):
+        """Stop the worker threads once the requests in flight have finished"""
+
+        self.__executor.shutdown(wait=False)
+
+
+
+
+    # private members
+    def __endpoint_name(self, endpoint):                    # helper
+        return endpoint.rstrip('/').rsplit('/', 1)[-1]
+
+
+    def __timed(self, send, name, started=None):
+        def timed(*args):
+            if started is not None:
+                started.set()
+            start = time()
+            try:
+                return send(*args)
+            finally:
+                self.__observe(name, time() - start)
+        return timed
+
+
+    def __observe(self, name, latency):
+        with self.__lock:
+            self.__latencies.setdefault(name, deque(maxlen=c.HEDGE_WINDOW)).append(latency)
+
+
+    def __hedge_delay(self, name):
+        if self.__delay is not None:
+            return self.__delay
+        with self.__lock:
+            samples = sorted(self.__latencies.get(name, ()))
+        if len(samples) < self.__min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * self.__percentile / 100))]
+
+
+    def __take_token(self):
+        with self.__lock:
+            if self.__tokens < 1.0:
+                return False
+            self.__tokens -= 1.0
+            self.__stats['hedges'] += 1
+            return True
@@ -0,0 +1,350 @@
+import os
+import math
+import mmap
+import struct
+import logging
+from time import sleep
+from time import time
+from multiprocessing import shared_memory
+
+from . import constants as c
+from .enums import StatusCode
+from .records import Records
+
+
+# layout: header, then one fixed size slot per market
+#   header : magic, market count, book depth, candle count, publish sequence
+#   slot   : slot sequence, ticker, market id, price, update time,
+#            bids (price, amount) * depth, asks (price, amount) * depth,
+#            candles (time, open, high, low, close, vol) * candle count
+MAGIC = b'YORAMD01'
+HEADER = struct.Struct('<8sIII4xQ')
+SLOT_HEAD = struct.Struct('<Q16sqdd')
+SEQ = struct.Struct('<Q')
+CANDLE_FIELDS = ('time', 'open', 'high', 'low', 'close', 'vol')
+
+
+def _slot_values(depth, n_candles):
+    return struct.Struct('<%dd' % (4 * depth + len(CANDLE_FIELDS) * n_candles))
+
+
+def _slot_size(depth, n_candles):
+    return SLOT_HEAD.size + _slot_values(depth, n_candles).size
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    # before python 3.13 SharedMemory registers every block it opens with the resource tracker,
+    # which either removes the block when the reader exits or, when the reader unregisters it,
+    # drops the registration of a publisher sharing the same tracker, so the block is mapped directly
+    try:
+        import _posixshmem
+    except ImportError:
+        # windows does not track shared memory
+        return shared_memory.SharedMemory(name=name)
+    return _MappedBlock(_posixshmem, name)
+
+
+class _MappedBlock:
+    """A shared memory block opened read only by name, without the resource tracker"""
+
+    def __init__(self, posixshmem, name):
+        fd = posixshmem.shm_open('/' + name, os.O_RDONLY, mode=0o600)
+        try:
+            self.__mmap = mmap.mmap(fd, os.fstat(fd).st_size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        self.buf = memoryview(self.__mmap)
+
+    def close(self):
+        self.buf.release()
+        self.__mmap.close()
+
+
+def _levels(side, depth, descending):
+    rows = side.values() if isinstance(side, dict) else (side or [])
+    levels = sorted(((float(row.get('price')), float(row.get('amount'))) for row in rows), reverse=descending)
+    return levels[:depth]
+
+
+class MarketDataPublisher:
+    """Polls the API and writes the latest market data to a shared memory block
+
+    A single publisher process owns the polling, and any number of MarketDataReader
+    processes on the same machine read from the block by name without making HTTP calls.
+    Each cycle costs one get_markets() call for every price plus one get_order_book()
+    call per market, and candles are refreshed with get_chart() every candle_refresh seconds.
+
+    Parameters
+    ----------
+    api : Yora.API
+        The API object used for polling
+    markets : list of str
+        The tickers of the markets to publish, eg. ['GRC/AUD']
+    name : str, optional
+        The name of the shared memory block
+    depth : int, optional
+        The number of order book levels kept for each side
+    n_candles : int, optional
+        The number of recent candles kept for each market
+    interval : int, optional
+        The candle interval in seconds, use the constants Yora.Times.MIN.value, ...
+    candle_refresh : float, optional
+        How often in seconds the candles are fetched again, defaults to the candle interval
+    replace : bool, optional
+        Whether an existing block with the same name, eg. one left by a publisher that crashed,
+        is removed and created again
+
+    Raises
+    ------
+    FileExistsError
+        If a block with the same name already exists and replace is False
+    """
+
+    # public interface
+    def __init__(self, api, markets, name=c.MARKET_DATA_SHM_NAME, depth=5, n_candles=20, interval=60, candle_refresh=None,
+                 replace=False):
+        self.__api = api
+        self.__markets = list(markets)
+        self.__depth = depth
+        self.__n_candles = n_candles
+        self.__interval = interval
+        self.__candle_refresh = interval if candle_refresh is None else candle_refresh
+        self.__values = _slot_values(depth, n_candles)
+        self.__slot_size = _slot_size(depth, n_candles)
+        self.__candles = {ticker : [] for ticker in self.__markets}
+        self.__last_candles = 0.0
+        self.__seq = 0
+
+        size = HEADER.size + self.__slot_size * len(self.__markets)
+        try:
+            self.__shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            if not replace:
+                raise FileExistsError('Shared memory block %s already exists, close the publisher using it '
+                                      'or pass replace=True to remove a block left by a crashed publisher' % name)
+            logging.warning('Replacing existing shared memory block %s', name)
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.__shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.__shm.buf[:size] = bytes(size)
+        HEADER.pack_into(self.__shm.buf, 0, MAGIC, len(self.__markets), depth, n_candles, 0)
+        for i, ticker in enumerate(self.__markets):
+            SLOT_HEAD.pack_into(self.__shm.buf, self.__offset(i), 0, ticker.encode('ascii'), 0, math.nan, 0.0)
+
+
+    @property
+    def name(self):
+        """The name of the shared memory block, to be passed to MarketDataReader"""
+        return self.__shm.name
+
+
+    def publish(self):
+        """Poll the API once and write the results to shared memory
+
+        Returns
+        -------
+        status_code : int
+            Status code of the first failing request, 0 on success
+        """
+
+        status_code, markets = self.__api.get_markets()
+        if status_code != StatusCode.OK.value:
+            return status_code
+
+        refresh_candles = time() - self.__last_candles >= self.__candle_refresh
+        for i, ticker in enumerate(self.__markets):
+            info = markets.get(ticker)
+            if info is None:
+                logging.warning('Market %s not found, not published', ticker)
+                continue
+
+            m_id = info.get('market_id')
+            status_code, orders = self.__api.get_order_book(m_id)
+            if status_code != StatusCode.OK.value:
+                return status_code
+
+            if refresh_candles:
+                now = int(time())
+                status_code, candles = self.__api.get_chart(m_id, self.__interval, now - self.__interval * self.__n_candles, now)
+                if status_code != StatusCode.OK.value:
+                    return status_code
+                self.__candles[ticker] = list(getattr(candles, 'raw', candles) or [])[-self.__n_candles:]
+
+            self.__write(i, ticker, m_id, info.get('price'), orders)
+
+        if refresh_candles:
+            self.__last_candles = time()
+        self.__seq += 1
+        HEADER.pack_into(self.__shm.buf, 0, MAGIC, len(self.__markets), self.__depth, self.__n_candles, self.__seq)
+        return StatusCode.OK.value
+
+
+    def run(self, stop=None, poll_interval=1.0):
+        """Publish repeatedly until stop is set
+
+        Parameters
+        ----------
+        stop : multiprocessing.Event or threading.Event, optional
+            Stops the loop once set, runs forever if not given
+        poll_interval : float, optional
+            The number of seconds to wait between polls
+        """
+
+        while stop is None or not stop.is_set():
+            status_code = self.publish()
+            if status_code != StatusCode.OK.value:
+                logging.warning('Market data poll failed with status %s', status_code)
+            sleep(poll_interval)
+
+
+    def close(self):
+        """Release and remove the shared memory block"""
+
+        self.__shm.close()
+        self.__shm.unlink()
+
+
+
+
+    # private members
+    def __offset(self, index):                              # helper
+        return HEADER.size + index * self.__slot_size
+
+
+    def __write(self, index, ticker, m_id, price, orders):
+        values = [math.nan] * (self.__values.size // 8)
+        for side, start, descending in (('buy', 0, True), ('sell', 2 * self.__depth, False)):
+            for j, (lvl_price, lvl_amount) in enumerate(_levels(orders.get(side), self.__depth, descending)):
+                values[start + 2 * j] = lvl_price
+                values[start + 2 * j + 1] = lvl_amount
+
+        start = 4 * self.__depth
+        for j, candle in enumerate(self.__candles[ticker]):
+            for k, field in enumerate(CANDLE_FIELDS):
+                value = candle.get(field)
+                values[start + j * len(CANDLE_FIELDS) + k] = math.nan if value is None else float(value)
+
+        # everything is packed first so a bad value raises before the slot is touched
+        offset = self.__offset(index)
+        seq = SEQ.unpack_from(self.__shm.buf, offset)[0]
+        data = SLOT_HEAD.pack(seq + 1, ticker.encode('ascii'), int(m_id),
+                              math.nan if price is None else float(price), time()) + self.__values.pack(*values)
+
+        # odd sequence numbers mark a slot as being written
+        SEQ.pack_into(self.__shm.buf, offset, seq + 1)
+        try:
+            self.__shm.buf[offset + SEQ.size : offset + len(data)] = data[SEQ.size:]
+        finally:
+            SEQ.pack_into(self.__shm.buf, offset, seq + 2)
+
+
+class MarketDataReader:
+    """Reads consistent snapshots of the market data written by a MarketDataPublisher
+
+    Parameters
+    ----------
+    name : str, optional
+        The name of the shared memory block used by the publisher
+    """
+
+    # public interface
+    def __init__(self, name=c.MARKET_DATA_SHM_NAME):
+        self.__shm = _attach(name)
+
+        magic, n_markets, depth, n_candles, _ = HEADER.unpack_from(self.__shm.buf, 0)
+        if magic != MAGIC:
+            raise ValueError('Shared memory block %s does not hold Yora market data' % name)
+
+        self.__depth = depth
+        self.__n_candles = n_candles
+        self.__values = _slot_values(depth, n_candles)
+        self.__slot_size = _slot_size(depth, n_candles)
+        self.__slots = {}
+        for i in range(n_markets):
+            offset = HEADER.size + i * self.__slot_size
+            _, ticker, _, _, _ = SLOT_HEAD.unpack_from(self.__shm.buf, offset)
+            self.__slots[ticker.rstrip(b'\0').decode('ascii')] = offset
+
+
+    @property
+    def sequence(self):
+        """The number of completed publish cycles, changes whenever new data is available"""
+        return HEADER.unpack_from(self.__shm.buf, 0)[4]
+
+
+    def markets(self):
+        """Get the tickers of the published markets"""
+
+        return list(self.__slots)
+
+
+    def snapshot(self, market):
+        """Get a consistent copy of the latest data for a market
+
+        Parameters
+        ----------
+        market : str
+            The ticker for the market, eg. 'GRC/AUD'
+
+        Returns
+        -------
+        snapshot : dict or None
+            Dictionary accessed by dictname['info'], with info being 'market_id', 'price', 'updated',
+            'bids' and 'asks' as lists of (price, amount) and 'candles' as Records, None before the first publish
+
+        Raises
+        ------
+        TimeoutError
+            If the slot is still being written after MARKET_DATA_READ_RETRIES attempts
+        """
+
+        offset = self.__slots[market]
+        for _ in range(c.MARKET_DATA_READ_RETRIES):
+            seq = SEQ.unpack_from(self.__shm.buf, offset)[0]
+            if seq % 2 == 0:
+                _, _, m_id, price, updated = SLOT_HEAD.unpack_from(self.__shm.buf, offset)
+                values = self.__values.unpack_from(self.__shm.buf, offset + SLOT_HEAD.size)
+                if SEQ.unpack_from(self.__shm.buf, offset)[0] == seq:
+                    break
+            # let the publisher finish its write
+            sleep(0.0001)
+        else:
+            raise TimeoutError('Market %s was still being written after %d reads' % (market, c.MARKET_DATA_READ_RETRIES))
+
+        if seq == 0:
+            return None
+
+        depth = self.__depth
+        width = len(CANDLE_FIELDS)
+        candles = []
+        for j in range(self.__n_candles):
+            row = values[4 * depth + j * width : 4 * depth + (j + 1) * width]
+            if not math.isnan(row[0]):
+                candles.append(dict(zip(CANDLE_FIELDS, row)))
+
+        return {
+            'market_id' : m_id,
+            'price' : None if math.isnan(price) else price,
+            'updated' : updated,
+            'bids' : self.__unpack_levels(values[:2 * depth]),
+            'asks' : self.__unpack_levels(values[2 * depth : 4 * depth]),
+            'candles' : Records(candles, ('time',), scale=1000)
+        }
+
+
+    def close(self):
+        """Detach from the shared memory block"""
+
+        self.__shm.close()
+
+
+
+
+    # private members
+    def __unpack_levels(self, values):                      # helper
+        return [(values[j], values[j + 1]) for j in range(0, len(values), 2) if not math.isnan(values[j])]
@@ -0,0 +1,269 @@
+import logging
+from time import time
+
+from . import constants as c
+from .enums import OrderType, StatusCode
+
+
+class OrderTracker:
+    """Local record of the user's open orders
+
+    Orders are added when trade() succeeds and removed when cancel_trade() succeeds,
+    and are indexed by market, direction and price so open order queries never make
+    an HTTP call. The local state is checked against the 'orders' endpoint by
+    reconcile(), which maybe_reconcile() only calls every reconcile_interval seconds
+    or after suspect() has been called.
+
+    Orders from the server are expected to contain 'trade_id', 'market_id',
+    'direction', 'amount' and 'price'.
+    """
+
+    # public interface
+    def __init__(self, api, reconcile_interval=c.ORDER_RECONCILE_INTERVAL):
+        self.__api = api
+        self.__reconcile_interval = reconcile_interval
+        self.__market_ids = {}
+        self.__orders = {}
+        self.__index = {}
+        self.__last_reconcile = 0.0
+        self.__suspect = True
+
+
+    def trade(self, market, direction, amount, price):
+        """Create a new trade through the API and track it on success
+
+        Takes the same parameters and returns the same values as API.trade()
+        """
+
+        response = self.__api.trade(market, direction, amount, price)
+        if response[0] == StatusCode.OK.value:
+            self.record_trade(market, direction, amount, price, response[1])
+        elif response[0] == StatusCode.TRANSACTION_DID_NOT_SETTLE.value:
+            self.suspect()
+        return response
+
+
+    def cancel_trade(self, trade_id):
+        """Cancel an active trade through the API and stop tracking it on success
+
+        Takes the same parameters and returns the same values as API.cancel_trade()
+        """
+
+        response = self.__api.cancel_trade(trade_id)
+        status_code = response[0] if isinstance(response, tuple) else response
+        if status_code == StatusCode.OK.value:
+            self.record_cancel(trade_id)
+        else:
+            self.suspect()
+        return response
+
+
+    def record_trade(self, market, direction, amount, price, response):
+        """Start tracking an order created outside of the tracker
+
+        Parameters
+        ----------
+        market : str or int
+            The market ID or name, eg 'GRC/AUD'
+        direction : int or OrderType
+            Whether the order is a buy or a sell
+        amount : float
+            The amount of the currency to buy or sell
+        price : float
+            The price to buy or sell at
+        response : dict
+            The response returned by API.trade(), containing 'trade_id' and 'tx_id'
+        """
+
+        m_id = self.__market_key(market)
+        if m_id is None or response is None or response.get('trade_id') is None:
+            self.suspect()
+            return
+
+        self.__add({
+            'trade_id' : response.get('trade_id'),
+            'tx_id' : response.get('tx_id'),
+            'market_id' : m_id,
+            'direction' : getattr(direction, 'value', direction),
+            'amount' : amount,
+            'price' : price
+        })
+
+
+    def record_cancel(self, trade_id):
+        """Stop tracking a cancelled order
+
+        Parameters
+        ----------
+        trade_id : int
+            The ID of the cancelled trade
+        """
+
+        self.__remove(self.__trade_key(trade_id))
+
+
+    def open_orders(self, market=None, direction=None, price=None):
+        """Get the tracked open orders, optionally narrowed down by market, direction and price
+
+        Parameters
+        ----------
+        market : str or int, optional
+            The market ID or name, eg 'GRC/AUD'
+        direction : int or OrderType, optional
+            Only return buy or sell orders, requires market
+        price : float, optional
+            Only return orders at this price, requires market and direction
+
+        Returns
+        -------
+        orders : list of dict
+            The matching orders accessed by listname[index]['info']
+        """
+
+        if market is None:
+            return list(self.__orders.values())
+
+        m_id = self.__market_key(market)
+        directions = (OrderType.BUY.value, OrderType.SELL.value) if direction is None else (int(getattr(direction, 'value', direction)),)
+
+        orders = []
+        for dirct in directions:
+            levels = self.__index.get((m_id, dirct), {})
+            if price is not None:
+                orders.extend(levels.get(float(price), {}).values())
+            else:
+                for level in levels.values():
+                    orders.extend(level.values())
+        return orders
+
+
+    def get(self, trade_id):
+        """Get a tracked order by its trade ID, None if it is not open"""
+
+        return self.__orders.get(self.__trade_key(trade_id))
+
+
+    def suspect(self):
+        """Flag the local state as possibly wrong so the next maybe_reconcile() checks it"""
+
+        self.__suspect = True
+
+
+    def maybe_reconcile(self):
+        """Reconcile if the interval has passed or the state is suspect
+
+        Returns
+        -------
+        status_code : int or None
+            Status code of the reconcile, None if it was not needed
+        """
+
+        if self.__suspect or time() - self.__last_reconcile >= self.__reconcile_interval:
+            return self.reconcile()
+        return None
+
+
+    def reconcile(self):
+        """Compare the tracked orders with the open orders on the server and apply the difference
+
+        Returns
+        -------
+        status_code : int
+            Status code of response, 0 on success
+        """
+
+        remote = {}
+        page = 0
+        previous = None
+        while True:
+            status_code, own_orders = self.__api.get_order_history(page)
+            if status_code != StatusCode.OK.value:
+                return status_code
+
+            open_rows = own_orders.get('open')
+            open_rows = getattr(open_rows, 'raw', open_rows) or []
+            if isinstance(open_rows, dict):
+                open_rows = list(open_rows.values())
+            # an empty page, or a repeat of the last one, means every open order has been seen
+            if not open_rows or open_rows[0] == previous:
+                break
+            previous = open_rows[0]
+            for row in open_rows:
+                row = self.__normalize(row)
+                remote[row['trade_id']] = row
+            page += 1
+
+        for trade_id in [t for t in self.__orders if t not in remote]:
+            logging.info('Order %s is no longer open', trade_id)
+            self.__remove(trade_id)
+
+        for trade_id, row in remote.items():
+            local = self.__orders.get(trade_id)
+            if local is not None and local['amount'] == row['amount'] and local['price'] == row['price']:
+                continue
+            if local is not None:
+                self.__remove(trade_id)
+                row['tx_id'] = local.get('tx_id')
+            else:
+                logging.info('Untracked open order %s found', trade_id)
+            self.__add(row)
+
+        self.__last_reconcile = time()
+        self.__suspect = False
+        return status_code
+
+
+
+
+    # private members
+    def __market_key(self, market):                         # helper
+        if isinstance(market, int):
+            return market
+        if market not in self.__market_ids:
+            status_code, markets = self.__api.get_markets()
+            if status_code != StatusCode.OK.value:
+                return None
+            for ticker, info in markets.items():
+                self.__market_ids[ticker] = int(info.get('market_id'))
+        return self.__market_ids.get(market)
+
+
+    def __trade_key(self, trade_id):                        # helper
+        # the server may send ids as numbers or strings, so numeric ids are compared as ints
+        try:
+            return int(trade_id)
+        except (TypeError, ValueError):
+            return trade_id
+
+
+    def __normalize(self, order):                           # helper
+        return {
+            'trade_id' : self.__trade_key(order.get('trade_id')),
+            'tx_id' : order.get('tx_id'),
+            'market_id' : int(order.get('market_id')),
+            'direction' : int(getattr(order.get('direction'), 'value', order.get('direction'))),
+            'amount' : float(order.get('amount')),
+            'price' : float(order.get('price'))
+        }
+
+
+    def __add(self, order):
+        order = self.__normalize(order)
+        self.__orders[order['trade_id']] = order
+        levels = self.__index.setdefault((order['market_id'], order['direction']), {})
+        levels.setdefault(order['price'], {})[order['trade_id']] = order
+
+
+    def __remove(self, trade_id):
+        order = self.__orders.pop(trade_id, None)
+        if order is None:
+            return
+
+        key = (order['market_id'], order['direction'])
+        levels = self.__index.get(key, {})
+        level = levels.get(order['price'], {})
+        level.pop(trade_id, None)
+        if not level:
+            levels.pop(order['price'], None)
+        if not levels:
+            self.__index.pop(key, None)
@@ -0,0 +1,338 @@
+import math
+import logging
+
+from . import constants as c
+from .enums import OrderType, StatusCode
+
+
+class Portfolio:
+    """Locally maintained mark-to-market view of an account
+
+    Balances are loaded with refresh_balances() and prices with refresh_prices(),
+    after which trades and cancellations made through the portfolio (or recorded
+    with record_trade() / record_cancel()) keep the balance and reserved amounts
+    current. A price tick via update_price() only revalues the asset it affects,
+    so valuation(), exposure() and pnl() never make an HTTP call.
+
+    The value of an asset is (balance + reserved) * price, where price is taken
+    from the market 'TICKER/QUOTE'. The quote currency itself is valued at 1.
+    The running total is summed again from the asset values every
+    PORTFOLIO_RESUM_INTERVAL price ticks so rounding errors do not build up.
+    """
+
+    # public interface
+    def __init__(self, api, quote=c.DEFAULT_QUOTE_CURRENCY):
+        self.__api = api
+        self.__quote = quote
+        self.__balances = {}
+        self.__prices = {}
+        self.__market_ids = {}
+        self.__values = {}
+        self.__total = 0.0
+        self.__ticks = 0
+        self.__baseline = None
+        self.__open_trades = {}
+
+
+    def refresh_balances(self):
+        """Reload the balances and reserved amounts from the server
+
+        Recorded orders are forgotten, oldest first, once the reserved amount of their
+        currency no longer covers them, as they have been filled.
+
+        Returns
+        -------
+        status_code : int
+            Status code of response, 0 on success
+        """
+
+        status_code, balances = self.__api.get_user_balances()
+        if status_code != StatusCode.OK.value:
+            return status_code
+
+        self.__balances = {}
+        for ticker, info in balances.items():
+            if not isinstance(info, dict):
+                continue
+            self.__balances[ticker] = {
+                'balance' : float(info.get('balance') or 0),
+                'reserved' : float(info.get('reserved') or 0)
+            }
+        self.__prune_open_trades()
+        self.__revalue_all()
+        return status_code
+
+
+    def refresh_prices(self):
+        """Reload the price of every market with a single get_markets() call
+
+        Returns
+        -------
+        status_code : int
+            Status code of response, 0 on success
+        """
+
+        status_code, markets = self.__api.get_markets()
+        if status_code != StatusCode.OK.value:
+            return status_code
+
+        for ticker, info in markets.items():
+            self.__market_ids[info.get('market_id')] = ticker
+            if info.get('price') is not None:
+                self.__prices[ticker] = float(info.get('price'))
+        self.__revalue_all()
+        return status_code
+
+
+    def refresh(self):
+        """Reload both the balances and the prices
+
+        Returns
+        -------
+        status_code : int
+            Status code of the first failing request, 0 on success
+        """
+
+        status_code = self.refresh_balances()
+        if status_code != StatusCode.OK.value:
+            return status_code
+        return self.refresh_prices()
+
+
+    def update_price(self, market, price):
+        """Set the price of a single market and revalue only the asset it affects
+
+        Parameters
+        ----------
+        market : str or int
+            The market ID or name, eg 'GRC/AUD'
+        price : float
+            The new price of the market
+        """
+
+        ticker = self.__market_ticker(market)
+        if ticker is None:
+            logging.warning('Price update for unknown market %s ignored', market)
+            return
+
+        self.__prices[ticker] = float(price)
+        base, quote = self.__split(ticker)
+        if quote == self.__quote:
+            self.__revalue(base)
+            self.__ticks += 1
+            if self.__ticks >= c.PORTFOLIO_RESUM_INTERVAL:
+                self.__resum()
+
+
+    def trade(self, market, direction, amount, price):
+        """Create a new trade through the API and record it on success
+
+        Takes the same parameters and returns the same values as API.trade()
+        """
+
+        response = self.__api.trade(market, direction, amount, price)
+        if response[0] == StatusCode.OK.value:
+            self.record_trade(market, direction, amount, price, response[1])
+        return response
+
+
+    def cancel_trade(self, trade_id):
+        """Cancel an active trade through the API and release its reservation on success
+
+        Takes the same parameters and returns the same values as API.cancel_trade()
+        """
+
+        response = self.__api.cancel_trade(trade_id)
+        status_code = response[0] if isinstance(response, tuple) else response
+        if status_code == StatusCode.OK.value:
+            self.record_cancel(trade_id)
+        return response
+
+
+    def record_trade(self, market, direction, amount, price, response):
+        """Move the funds committed to a new order from balance to reserved
+
+        Parameters
+        ----------
+        market : str or int
+            The market ID or name, eg 'GRC/AUD'
+        direction : int or OrderType
+            Whether the order is a buy or a sell
+        amount : float
+            The amount of the currency to buy or sell
+        price : float
+            The price to buy or sell at
+        response : dict
+            The response returned by API.trade(), containing 'trade_id'
+        """
+
+        ticker = self.__market_ticker(market)
+        if ticker is None:
+            logging.warning('Trade on unknown market %s not recorded', market)
+            return
+
+        base, quote = self.__split(ticker)
+        if getattr(direction, 'value', direction) == OrderType.BUY.value:
+            currency, reserved = quote, float(amount) * float(price)
+        else:
+            currency, reserved = base, float(amount)
+
+        self.__reserve(currency, reserved)
+        trade_id = response.get('trade_id') if response is not None else None
+        if trade_id is not None:
+            self.__open_trades[trade_id] = (currency, reserved)
+
+
+    def record_cancel(self, trade_id):
+        """Return the funds reserved by a cancelled order to the balance
+
+        Parameters
+        ----------
+        trade_id : int
+            The ID of the cancelled trade
+        """
+
+        entry = self.__open_trades.pop(trade_id, None)
+        if entry is None:
+            return
+        currency, reserved = entry
+        self.__reserve(currency, -reserved)
+
+
+    def valuation(self, ticker=None):
+        """Get the value of the portfolio in the quote currency
+
+        Parameters
+        ----------
+        ticker : str, optional
+            Only return the value of this currency, eg. 'GRC'
+
+        Returns
+        -------
+        value : float or None
+            Total value, or the value of the requested currency, None if it has no price
+        """
+
+        if ticker is None:
+            return self.__total
+        return self.__values.get(ticker)
+
+
+    def exposure(self):
+        """Get a snapshot of the holdings and value of every currency
+
+        Returns
+        -------
+        exposure : dict
+            Dictionary accessed by dictname['ticker']['info'], with info being 'balance',
+            'reserved', 'price', 'value' and 'weight', along with the total in dictname['total']
+        """
+
+        snapshot = {}
+        for ticker, bal in self.__balances.items():
+            value = self.__values.get(ticker)
+            snapshot[ticker] = {
+                'balance' : bal['balance'],
+                'reserved' : bal['reserved'],
+                'price' : self.__price_of(ticker),
+                'value' : value,
+                'weight' : value / self.__total if value is not None and self.__total else None
+            }
+        snapshot['total'] = self.__total
+        return snapshot
+
+
+    def mark(self):
+        """Record the current valuation as the baseline used by pnl()"""
+
+        self.__baseline = (self.__total, dict(self.__values))
+
+
+    def pnl(self):
+        """Get the change in value since the last mark()
+
+        The first call marks the baseline if mark() has not been called yet.
+
+        Returns
+        -------
+        pnl : dict
+            Dictionary of the change in value of each currency accessed by dictname['ticker'],
+            along with the change in total value in dictname['total']
+        """
+
+        if self.__baseline is None:
+            self.mark()
+        base_total, base_values = self.__baseline
+
+        changes = {}
+        for ticker, value in self.__values.items():
+            changes[ticker] = value - base_values.get(ticker, 0.0)
+        for ticker, value in base_values.items():
+            if ticker not in changes:
+                changes[ticker] = -value
+        changes['total'] = self.__total - base_total
+        return changes
+
+
+
+
+    # private members
+    def __split(self, ticker):                              # helper
+        base, _, quote = ticker.partition('/')
+        return base, quote
+
+    def __market_ticker(self, market):                      # helper
+        if isinstance(market, int):
+            return self.__market_ids.get(market)
+        return market
+
+    def __price_of(self, ticker):                           # helper
+        if ticker == self.__quote:
+            return 1.0
+        return self.__prices.get(ticker + '/' + self.__quote)
+
+
+    def __reserve(self, currency, amount):
+        bal = self.__balances.setdefault(currency, {'balance' : 0.0, 'reserved' : 0.0})
+        bal['balance'] -= amount
+        bal['reserved'] += amount
+
+
+    def __revalue(self, ticker):
+        old = self.__values.pop(ticker, None)
+        if old is not None:
+            self.__total -= old
+
+        bal = self.__balances.get(ticker)
+        price = self.__price_of(ticker)
+        if bal is None or price is None:
+            return
+
+        value = (bal['balance'] + bal['reserved']) * price
+        self.__values[ticker] = value
+        self.__total += value
+
+
+    def __revalue_all(self):
+        self.__values = {}
+        self.__total = 0.0
+        for ticker in self.__balances:
+            self.__revalue(ticker)
+        self.__resum()
+
+
+    def __resum(self):
+        self.__total = math.fsum(self.__values.values())
+        self.__ticks = 0
+
+
+    def __prune_open_trades(self):
+        # the newest orders are kept while they fit in the reserved amount reported by the server
+        left = {ticker : bal['reserved'] for ticker, bal in self.__balances.items()}
+        for trade_id in reversed(list(self.__open_trades)):
+            currency, reserved = self.__open_trades[trade_id]
+            available = left.get(currency, 0.0)
+            if reserved <= available or math.isclose(reserved, available):
+                left[currency] = available - reserved
+            else:
+                del self.__open_trades[trade_id]
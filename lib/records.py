@@ -0,0 +1,164 @@
+import datetime
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+
+
+def to_unixtime(value):
+    """Convert a datetime, a 'yyyy-mm-dd hh:mm:ss' string or a unix time in seconds to a unix time in seconds"""
+
+    if isinstance(value, datetime.datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.datetime.strptime(value, "%Y-%m-%d %H:%M:%S").timestamp()
+    return value
+
+
+class Record(Mapping):
+    """A single row of a Records result
+
+    Behaves like a read-only dictionary. Time fields are stored as the raw epoch
+    value returned by the server and converted to datetime when they are accessed.
+    """
+
+    __slots__ = ('_raw', '_time_fields', '_scale')
+
+    def __init__(self, raw, time_fields, scale):
+        self._raw = raw
+        self._time_fields = time_fields
+        self._scale = scale
+
+    def __getitem__(self, key):
+        value = self._raw[key]
+        if key in self._time_fields and value is not None:
+            return datetime.datetime.fromtimestamp(value / self._scale)
+        return value
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __len__(self):
+        return len(self._raw)
+
+    def __repr__(self):
+        return 'Record(%r)' % (self._raw,)
+
+    @property
+    def raw(self):
+        """The row as returned by the server, with time fields left as epoch values"""
+        return self._raw
+
+
+class Records(Sequence):
+    """Indexed rows from a history or chart request with lazily converted time fields
+
+    Parameters
+    ----------
+    rows : list or dict
+        The rows returned by the server, either a list or a dictionary indexed by row number
+    time_fields : tuple of str
+        The names of the fields holding epoch times, eg. ('time',)
+    scale : int, optional
+        The number of raw units in a second, 1000 for millisecond times
+    """
+
+    def __init__(self, rows, time_fields, scale=1):
+        if isinstance(rows, dict):
+            rows = list(rows.values())
+        self._rows = list(rows or [])
+        self._time_fields = tuple(time_fields)
+        self._scale = scale
+        self._sorted = {}
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Records(self._rows[index], self._time_fields, self._scale)
+        return Record(self._rows[index], self._time_fields, self._scale)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __repr__(self):
+        return 'Records(%d rows, time_fields=%r)' % (len(self._rows), self._time_fields)
+
+    @property
+    def raw(self):
+        """The rows as returned by the server, with time fields left as epoch values"""
+        return self._rows
+
+    def times(self, field=None):
+        """Get the raw epoch values of a time field for every row
+
+        Parameters
+        ----------
+        field : str, optional
+            The time field, defaults to the first time field
+        """
+
+        field = field or self._time_fields[0]
+        return [row.get(field) for row in self._rows]
+
+    def to_list(self):
+        """Convert every row to a dictionary with datetime values in one pass
+
+        Returns
+        -------
+        rows : list of dict
+            The converted rows
+        """
+
+        converted = []
+        for row in self._rows:
+            row = dict(row)
+            for field in self._time_fields:
+                if row.get(field) is not None:
+                    row[field] = datetime.datetime.fromtimestamp(row[field] / self._scale)
+            converted.append(row)
+        return converted
+
+    def between(self, start=None, end=None, field=None):
+        """Get the rows whose time falls within a range, comparing raw epoch values
+
+        Parameters
+        ----------
+        start : datetime, str or int, optional
+            Inclusive start of the range, as a datetime, 'yyyy-mm-dd hh:mm:ss' or unix time in seconds
+        end : datetime, str or int, optional
+            Exclusive end of the range, in the same formats as start
+        field : str, optional
+            The time field to filter on, defaults to the first time field
+
+        Returns
+        -------
+        records : Records
+            The rows within the range, in their original order
+        """
+
+        field = field or self._time_fields[0]
+        lo = float('-inf') if start is None else to_unixtime(start) * self._scale
+        hi = float('inf') if end is None else to_unixtime(end) * self._scale
+
+        times, order = self._sorted_times(field)
+        if order is None:
+            rows = [row for row, t in zip(self._rows, times) if t is not None and lo <= t < hi]
+            return Records(rows, self._time_fields, self._scale)
+
+        # time ordered rows are cut out with two binary searches
+        first, last = bisect_left(times, lo), bisect_left(times, hi)
+        if order > 0:
+            return Records(self._rows[first:last], self._time_fields, self._scale)
+        n = len(self._rows)
+        return Records(self._rows[n - last:n - first], self._time_fields, self._scale)
+
+    def _sorted_times(self, field):
+        # the raw times in ascending order along with 1 if the rows are ascending,
+        # -1 if they are descending and None if they are not ordered, worked out once per field
+        if field not in self._sorted:
+            times = self.times(field)
+            order = None
+            if None not in times:
+                if all(a <= b for a, b in zip(times, times[1:])):
+                    order = 1
+                elif all(a >= b for a, b in zip(times, times[1:])):
+                    order, times = -1, times[::-1]
+            self._sorted[field] = (times, order)
+        return self._sorted[field]
@@ -0,0 +1,153 @@
+import threading
+from itertools import count
+from time import time
+
+from . import constants as c
+
+
+class RequestScheduler:
+    """Orders concurrent API requests by priority class
+
+    Requests wait until a slot is free, and a slot always goes to the waiting request
+    with the lowest priority number whose class is under its concurrency cap, so orders
+    and cancels (priority 0) go ahead of account data (1) and market data (2). The other
+    classes together never use more than max_concurrent - reserved slots, so an order
+    always finds a free slot while fewer than reserved orders are in flight.
+
+    A request still waiting when its deadline passes is dropped without being sent.
+
+    Parameters
+    ----------
+    max_concurrent : int, optional
+        The number of requests in flight at once across all classes
+    reserved : int, optional
+        The number of slots only orders and cancels may use
+    rate : float, optional
+        The maximum number of requests sent per second, unlimited if not given
+    caps : dict, optional
+        The number of requests in flight at once for each priority class
+    deadlines : dict, optional
+        The number of seconds each priority class may wait before it is dropped, None to wait forever
+    """
+
+    # public interface
+    def __init__(self, max_concurrent=c.SCHEDULER_MAX_CONCURRENT, reserved=c.SCHEDULER_RESERVED_FOR_ORDERS,
+                 rate=None, caps=None, deadlines=None):
+        self.__max_concurrent = max_concurrent
+        self.__reserved = reserved
+        self.__interval = 0.0 if rate is None else 1.0 / rate
+        self.__caps = dict(c.SCHEDULER_CLASS_CAPS if caps is None else caps)
+        self.__deadlines = dict(c.SCHEDULER_DEADLINES if deadlines is None else deadlines)
+        self.__cond = threading.Condition()
+        self.__order = count()
+        self.__waiting = []
+        self.__active = {}
+        self.__next_send = 0.0
+        self.__stats = {}
+
+
+    def call(self, priority, fn, *args, deadline=None):
+        """Run fn(*args) once the scheduler gives it a slot
+
+        Parameters
+        ----------
+        priority : int
+            The priority class, eg. constants.PRIORITY_ORDER
+        fn : callable
+            The function that sends the request
+        deadline : float, optional
+            The number of seconds the request may wait, defaults to the deadline of its class
+
+        Returns
+        -------
+        result : object or None
+            The return value of fn, None if the request was dropped
+        """
+
+        if deadline is None:
+            deadline = self.__deadlines.get(priority)
+        expires = None if deadline is None else time() + deadline
+
+        if not self.__enter(priority, expires):
+            return None
+        try:
+            return fn(*args)
+        finally:
+            self.__leave(priority)
+
+
+    def stats(self):
+        """Get the number of requests sent, dropped, waiting and in flight for each priority class
+
+        Returns
+        -------
+        stats : dict
+            Dictionary accessed by dictname[priority]['info'], with info being 'sent', 'dropped', 'waiting' or 'active'
+        """
+
+        with self.__cond:
+            stats = {}
+            for priority in set(self.__caps) | set(self.__stats) | set(self.__active):
+                counts = self.__stats.get(priority, {})
+                stats[priority] = {
+                    'sent' : counts.get('sent', 0),
+                    'dropped' : counts.get('dropped', 0),
+                    'waiting' : sum(1 for entry in self.__waiting if entry[0] == priority),
+                    'active' : self.__active.get(priority, 0)
+                }
+            return stats
+
+
+
+
+    # private members
+    def __count(self, priority, key):                       # helper
+        counts = self.__stats.setdefault(priority, {})
+        counts[key] = counts.get(key, 0) + 1
+
+
+    def __next_eligible(self):
+        if sum(self.__active.values()) >= self.__max_concurrent:
+            return None
+        others = sum(n for priority, n in self.__active.items() if priority != c.PRIORITY_ORDER)
+        for entry in sorted(self.__waiting):
+            if self.__active.get(entry[0], 0) >= self.__caps.get(entry[0], self.__max_concurrent):
+                continue
+            if entry[0] != c.PRIORITY_ORDER and others >= self.__max_concurrent - self.__reserved:
+                continue
+            return entry
+        return None
+
+
+    def __enter(self, priority, expires):
+        with self.__cond:
+            entry = (priority, next(self.__order))
+            self.__waiting.append(entry)
+            while True:
+                now = time()
+                if expires is not None and now >= expires:
+                    self.__waiting.remove(entry)
+                    self.__count(priority, 'dropped')
+                    self.__cond.notify_all()
+                    return False
+
+                if self.__next_eligible() == entry and now >= self.__next_send:
+                    self.__waiting.remove(entry)
+                    self.__active[priority] = self.__active.get(priority, 0) + 1
+                    self.__next_send = max(now, self.__next_send) + self.__interval
+                    self.__count(priority, 'sent')
+                    self.__cond.notify_all()
+                    return True
+
+                timeout = None
+                if self.__next_send > now:
+                    timeout = self.__next_send - now
+                if expires is not None:
+                    timeout = expires - now if timeout is None else min(timeout, expires - now)
+                self.__cond.wait(timeout)
+
+
+    def __leave(self, priority):
+        with self.__cond:
+            self.__active[priority] -= 1
+            self.__cond.notify_all()
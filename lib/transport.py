@@ -0,0 +1,167 @@
+import gzip
+import json
+import threading
+from collections import deque
+from time import sleep
+from time import time
+
+from . import constants as c
+
+
+def _redact(payload):                                       # helper
+    if not isinstance(payload, dict):
+        return payload
+    return {key : c.REDACTED if key in c.REDACTED_FIELDS else value for key, value in payload.items()}
+
+
+def _key(method, url, payload):                             # helper
+    return method, url, json.dumps(_redact(payload), sort_keys=True, default=str)
+
+
+class ReplayedResponse:
+    """The parts of a requests.Response used by api_caller, rebuilt from a capture"""
+
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class RecordingTransport:
+    """Sends requests through another transport and records each request and response to a capture file
+
+    The capture is gzipped json, one line per request holding the method, url, payload
+    with the token redacted, status code, response body and the time the response took.
+    Lines are flushed to the file every flush_lines requests or flush_interval seconds,
+    so a process that stops without calling close() loses at most the lines since then.
+
+    Parameters
+    ----------
+    path : str
+        The capture file to write
+    transport : object, optional
+        The transport that sends the requests, defaults to the requests module
+    flush_lines : int, optional
+        The number of unflushed lines that triggers a flush
+    flush_interval : float, optional
+        The number of seconds after which unflushed lines are flushed by the next request
+    """
+
+    def __init__(self, path, transport=None, flush_lines=c.CAPTURE_FLUSH_LINES,
+                 flush_interval=c.CAPTURE_FLUSH_INTERVAL):
+        if transport is None:
+            import requests as transport
+        self.__transport = transport
+        self.__flush_lines = flush_lines
+        self.__flush_interval = flush_interval
+        self.__unflushed = 0
+        self.__last_flush = time()
+        self.__lock = threading.Lock()
+        self.__file = gzip.open(path, 'wt')
+
+    def get(self, url, params=None, headers=None):
+        return self.__record('GET', url, params, self.__transport.get, params=params, headers=headers)
+
+    def post(self, url, json=None, headers=None):
+        return self.__record('POST', url, json, self.__transport.post, json=json, headers=headers)
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __record(self, method, url, payload, send, **kwargs):
+        start = time()
+        r = send(url, **kwargs)
+        elapsed = time() - start
+
+        line = json.dumps({
+            'method' : method,
+            'url' : url,
+            'payload' : _redact(payload),
+            'status' : r.status_code,
+            'body' : r.text,
+            'elapsed' : round(elapsed, 6)
+        }, separators=(',', ':'), default=str)
+        with self.__lock:
+            self.__file.write(line + '\n')
+            self.__unflushed += 1
+            if self.__unflushed >= self.__flush_lines or time() - self.__last_flush >= self.__flush_interval:
+                self.__file.flush()
+                self.__unflushed = 0
+                self.__last_flush = time()
+        return r
+
+
+class ReplayTransport:
+    """Answers requests from a capture written by RecordingTransport without using the network
+
+    Requests are matched by method, url and payload (ignoring the token), and repeated
+    requests are answered in the order they were recorded. A capture that was not closed
+    is read up to the last line flushed before the recording stopped.
+
+    Parameters
+    ----------
+    path : str
+        The capture file to read
+    latency_scale : float, optional
+        How long each response takes compared to the recording, 1 for the original speed
+        and 0 to answer as fast as possible
+    """
+
+    def __init__(self, path, latency_scale=1.0):
+        self.__latency_scale = latency_scale
+        self.__lock = threading.Lock()
+        self.__responses = {}
+        for line in self.__read_lines(path):
+            entry = json.loads(line)
+            key = _key(entry['method'], entry['url'], entry['payload'])
+            self.__responses.setdefault(key, deque()).append(entry)
+
+    def get(self, url, params=None, headers=None):
+        return self.__replay('GET', url, params)
+
+    def post(self, url, json=None, headers=None):
+        return self.__replay('POST', url, json)
+
+    def remaining(self):
+        """Get the number of recorded responses that have not been replayed yet"""
+
+        with self.__lock:
+            return sum(len(queue) for queue in self.__responses.values())
+
+    def __read_lines(self, path):                           # helper
+        data = []
+        with gzip.open(path, 'rb') as f:
+            try:
+                for chunk in iter(lambda: f.read1(65536), b''):
+                    data.append(chunk)
+            except EOFError:
+                # the recording stopped without close(), keep what was flushed before that
+                pass
+        lines = b''.join(data).decode('utf-8').split('\n')
+        # the last piece is empty for a complete capture and a partly flushed line otherwise
+        return [line for line in lines[:-1] if line]
+
+    def __replay(self, method, url, payload):
+        key = _key(method, url, payload)
+        with self.__lock:
+            queue = self.__responses.get(key)
+            if not queue:
+                raise LookupError('No recorded response left for %s %s with payload %s' % key)
+            entry = queue.popleft()
+
+        if self.__latency_scale > 0:
+            sleep(entry['elapsed'] * self.__latency_scale)
+        return ReplayedResponse(entry['status'], entry['body'])
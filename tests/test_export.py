@@ -0,0 +1,37 @@
+import csv
+
+from lib import export
+
+
+TRADES = [{'time' : t, 'amount' : i} for i, t in enumerate([100, 90, 90, 80, 70, 60, 50, 50, 40, 30])]
+
+
+class FakeAPI:
+    def __init__(self, trades, fail_after=None):
+        self.trades = trades
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def get_markets(self):
+        return 0, {'GRC/AUD' : {'market_id' : 1}}
+
+    def market_history(self, market_id, page):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            return 101, None
+        return 0, self.trades[page * 3 : (page + 1) * 3]
+
+
+def test_resumed_trade_export_skips_rows_shifted_by_new_trades(tmp_path):
+    out = str(tmp_path)
+    status_code, finished = export.export(FakeAPI(TRADES, fail_after=2), ['GRC/AUD'], [], 0, 10, out, chunk_size=1, workers=1)
+    assert (status_code, finished) == (101, None)
+
+    # two new trades push every row two places down the pages
+    newer = [{'time' : 120, 'amount' : 98}, {'time' : 110, 'amount' : 99}]
+    status_code, finished = export.export(FakeAPI(newer + TRADES), ['GRC/AUD'], [], 0, 10, out, chunk_size=1, workers=1)
+    assert (status_code, finished) == (0, ['trades_GRC-AUD'])
+
+    with open(tmp_path / 'trades_GRC-AUD.csv') as f:
+        rows = list(csv.DictReader(f))
+    assert [int(row['amount']) for row in rows] == list(range(len(TRADES)))
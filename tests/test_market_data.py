@@ -0,0 +1,84 @@
+import os
+import sys
+import subprocess
+import multiprocessing
+from time import sleep
+from multiprocessing import shared_memory
+
+import pytest
+
+from lib.market_data import MarketDataPublisher, MarketDataReader
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeAPI:
+    def get_markets(self):
+        return 0, {'GRC/AUD' : {'market_id' : 1, 'price' : 0.5}}
+
+    def get_order_book(self, market_id):
+        return 0, {'buy' : [{'price' : 0.4, 'amount' : 10}], 'sell' : [{'price' : 0.6, 'amount' : 20}]}
+
+    def get_chart(self, market_id, interval, start, end, page=0):
+        return 0, []
+
+
+def _read(name, queue):
+    reader = MarketDataReader(name)
+    snapshot = reader.snapshot('GRC/AUD')
+    reader.close()
+    queue.put((snapshot['price'], snapshot['bids'], snapshot['asks']))
+
+
+def _publish_and_crash(name):
+    # run in its own interpreter so the block is only tracked by this process' resource tracker
+    publisher = MarketDataPublisher(FakeAPI(), ['GRC/AUD'], name=name)
+    publisher.publish()
+
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    reader = ctx.Process(target=_read, args=(name, queue))
+    reader.start()
+    print(queue.get(timeout=30))
+    reader.join()
+    sys.stdout.flush()
+    os._exit(reader.exitcode)
+
+
+def test_reader_process_leaves_publisher_registration():
+    name = 'yora_test_%d' % os.getpid()
+    script = 'import sys; sys.path[:0] = [%r, %r]; import test_market_data; test_market_data._publish_and_crash(%r)' % (
+        os.path.join(ROOT, 'tests'), ROOT, name)
+    result = subprocess.run([sys.executable, '-c', script], cwd=ROOT, capture_output=True, text=True, timeout=60)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == '(0.5, [(0.4, 10.0)], [(0.6, 20.0)])'
+    assert 'KeyError' not in result.stderr
+
+    # the publisher crashed without close(), so its resource tracker has to remove the block
+    for _ in range(100):
+        try:
+            publisher = MarketDataPublisher(FakeAPI(), ['GRC/AUD'], name=name)
+            break
+        except FileExistsError:
+            sleep(0.05)
+    else:
+        pytest.fail('Shared memory block %s was leaked by the crashed publisher' % name)
+    publisher.close()
+
+
+def test_stale_block_is_replaced_on_request():
+    name = 'yora_test_stale_%d' % os.getpid()
+    stale = shared_memory.SharedMemory(name=name, create=True, size=16)
+    stale.close()
+
+    with pytest.raises(FileExistsError):
+        MarketDataPublisher(FakeAPI(), ['GRC/AUD'], name=name)
+
+    publisher = MarketDataPublisher(FakeAPI(), ['GRC/AUD'], name=name, replace=True)
+    publisher.publish()
+    reader = MarketDataReader(name)
+    assert reader.snapshot('GRC/AUD')['price'] == 0.5
+    reader.close()
+    publisher.close()
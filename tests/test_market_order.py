@@ -0,0 +1,100 @@
+import pytest
+
+import Yora
+from lib import api_caller
+
+
+BOOK = {
+    'buy' : [{'price' : 0.9, 'amount' : 5}, {'price' : 0.8, 'amount' : 5}],
+    'sell' : [{'price' : 1.1, 'amount' : 10}, {'price' : 1.0, 'amount' : 10}, {'price' : 1.2, 'amount' : 10}]
+}
+
+
+class FakeServer:
+    def __init__(self, book):
+        self.book = book
+        self.calls = []
+
+    def get(self, endpoint, payload, user_agent, host):
+        self.calls.append((endpoint, payload))
+        responses = {
+            'markets' : [{'ticker' : 'GRC/AUD', 'market_id' : 1}],
+            'marketorders' : self.book
+        }
+        return {'http-code' : 200, 'data' : {'status_code' : 0, 'response' : responses[endpoint]}}
+
+    def post(self, endpoint, payload, user_agent, host):
+        self.calls.append((endpoint, payload))
+        return {'http-code' : 200, 'data' : {'status_code' : 0, 'response' : {'trade_id' : 11, 'tx_id' : 'tx'}}}
+
+    def endpoints(self):
+        return [endpoint for endpoint, _ in self.calls]
+
+    def trade(self):
+        return [payload for endpoint, payload in self.calls if endpoint == 'trade'][-1]
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer(BOOK)
+    monkeypatch.setattr(api_caller, '_get', server.get)
+    monkeypatch.setattr(api_caller, '_post', server.post)
+    return server
+
+
+def test_buy_walks_asks_and_stays_within_to_spend(server):
+    status_code, response = Yora.API('token').simple_buy('GRC/AUD', 15)
+
+    assert status_code == 0
+    trade = server.trade()
+    assert trade['direction'] == Yora.OrderType.BUY.value
+    assert trade['price'] == 1.1
+    assert trade['amount'] * trade['price'] <= 15
+    assert response['vwap'] == pytest.approx(15 / (10 + 5 / 1.1))
+    assert response['slippage'] == pytest.approx(response['vwap'] - 1.0)
+
+
+def test_sell_walks_bids_to_the_deepest_price(server):
+    status_code, response = Yora.API('token').simple_sell('GRC/AUD', 8)
+
+    assert status_code == 0
+    trade = server.trade()
+    assert trade['direction'] == Yora.OrderType.SELL.value
+    assert (trade['price'], trade['amount']) == (0.8, 8)
+    assert response['vwap'] == pytest.approx((5 * 0.9 + 3 * 0.8) / 8)
+
+
+def test_shallow_book_rests_the_rest_at_the_deepest_price(server):
+    status_code, _ = Yora.API('token').simple_buy('GRC/AUD', 100)
+
+    assert status_code == 0
+    trade = server.trade()
+    assert trade['price'] == 1.2
+    assert trade['amount'] * trade['price'] <= 100
+
+
+def test_empty_book_places_no_order(server):
+    server.book = {'buy' : [], 'sell' : []}
+    status_code, response = Yora.API('token').simple_buy('GRC/AUD', 15)
+
+    assert (status_code, response) == (Yora.StatusCode.RESOURCE_NOT_FOUND.value, None)
+    assert 'trade' not in server.endpoints()
+
+
+def test_warm_cache_only_sends_the_trade(server):
+    api = Yora.API('token')
+    api.get_order_book('GRC/AUD')
+    server.calls = []
+
+    api.simple_buy('GRC/AUD', 15)
+    assert server.endpoints() == ['trade']
+
+
+def test_cancel_drops_cached_books(server):
+    api = Yora.API('token')
+    api.get_order_book('GRC/AUD')
+    api.cancel_trade(11)
+    server.calls = []
+
+    api.simple_buy('GRC/AUD', 15)
+    assert server.endpoints() == ['marketorders', 'trade']
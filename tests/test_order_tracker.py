@@ -0,0 +1,29 @@
+from lib.enums import OrderType
+from lib.order_tracker import OrderTracker
+
+
+class FakeAPI:
+    def __init__(self, open_rows):
+        self.open_rows = open_rows
+
+    def get_markets(self):
+        return 0, {'GRC/AUD' : {'market_id' : 1}}
+
+    def trade(self, market, direction, amount, price):
+        return 0, {'trade_id' : 11, 'tx_id' : 'tx'}
+
+    def get_order_history(self, page=None):
+        return 0, {'open' : self.open_rows if not page else []}
+
+
+def test_reconcile_matches_ids_sent_as_strings():
+    api = FakeAPI([{'trade_id' : '11', 'market_id' : '1', 'direction' : '0', 'amount' : '2', 'price' : '0.5'}])
+    tracker = OrderTracker(api)
+    tracker.trade('GRC/AUD', OrderType.BUY, 2, 0.5)
+
+    assert tracker.reconcile() == 0
+    assert tracker.get('11')['tx_id'] == 'tx'
+    assert tracker.open_orders('GRC/AUD', OrderType.BUY, 0.5) == [tracker.get(11)]
+
+    tracker.record_cancel('11')
+    assert tracker.open_orders() == []
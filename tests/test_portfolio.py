@@ -0,0 +1,46 @@
+from lib import constants as c
+from lib.enums import OrderType
+from lib.portfolio import Portfolio
+
+
+class FakeAPI:
+    def __init__(self):
+        self.reserved = 0.0
+        self.trades = 0
+
+    def get_user_balances(self):
+        return 0, {'AUD' : {'balance' : 100, 'reserved' : self.reserved}, 'GRC' : {'balance' : 10, 'reserved' : 0}, 'sum_aud' : 101}
+
+    def get_markets(self):
+        return 0, {'GRC/AUD' : {'market_id' : 1, 'price' : 0.1}}
+
+    def trade(self, market, direction, amount, price):
+        self.trades += 1
+        return 0, {'trade_id' : self.trades}
+
+    def cancel_trade(self, trade_id):
+        return 0, None
+
+
+def test_filled_orders_are_forgotten_on_refresh():
+    api = FakeAPI()
+    portfolio = Portfolio(api)
+    portfolio.refresh()
+    portfolio.trade('GRC/AUD', OrderType.BUY, 10, 0.5)
+    portfolio.trade('GRC/AUD', OrderType.BUY, 4, 0.5)
+
+    # the first order filled, only the second still reserves funds on the server
+    api.reserved = 2.0
+    portfolio.refresh_balances()
+    portfolio.cancel_trade(1)
+    assert portfolio.exposure()['AUD']['reserved'] == 2.0
+    portfolio.cancel_trade(2)
+    assert portfolio.exposure()['AUD']['reserved'] == 0.0
+
+
+def test_total_matches_values_after_many_ticks():
+    portfolio = Portfolio(FakeAPI())
+    portfolio.refresh()
+    for i in range(2 * c.PORTFOLIO_RESUM_INTERVAL):
+        portfolio.update_price('GRC/AUD', 0.1 + (i % 7) * 0.0137)
+    assert portfolio.valuation() == portfolio.valuation('AUD') + portfolio.valuation('GRC')
@@ -0,0 +1,94 @@
+import json
+import threading
+from time import time
+
+import Yora
+from lib import constants as c
+from lib.api_caller import set_scheduler, set_transport
+from lib.scheduler import RequestScheduler
+from lib.transport import ReplayedResponse
+
+
+def _hold(scheduler, priority, started, release):
+    def fn():
+        started.release()
+        release.wait(5)
+    threading.Thread(target=scheduler.call, args=(priority, fn)).start()
+
+
+def test_order_is_not_blocked_by_other_classes():
+    scheduler = RequestScheduler(max_concurrent=4, reserved=2, deadlines={})
+    started = threading.Semaphore(0)
+    release = threading.Event()
+    try:
+        for priority in (c.PRIORITY_MARKET_DATA, c.PRIORITY_MARKET_DATA, c.PRIORITY_ACCOUNT, c.PRIORITY_ACCOUNT):
+            _hold(scheduler, priority, started, release)
+        for _ in range(2):
+            assert started.acquire(timeout=1)
+
+        start = time()
+        assert scheduler.call(c.PRIORITY_ORDER, lambda: 'ack') == 'ack'
+        assert time() - start < 0.1
+
+        stats = scheduler.stats()
+        active = stats[c.PRIORITY_MARKET_DATA]['active'] + stats[c.PRIORITY_ACCOUNT]['active']
+        assert active == 2
+    finally:
+        release.set()
+
+
+def test_reserved_slots_are_not_used_by_other_classes():
+    scheduler = RequestScheduler(max_concurrent=2, reserved=1, deadlines={})
+    started = threading.Semaphore(0)
+    release = threading.Event()
+    try:
+        _hold(scheduler, c.PRIORITY_MARKET_DATA, started, release)
+        assert started.acquire(timeout=1)
+        assert scheduler.call(c.PRIORITY_ACCOUNT, lambda: 'sent', deadline=0.05) is None
+        assert scheduler.call(c.PRIORITY_ORDER, lambda: 'ack', deadline=0.05) == 'ack'
+    finally:
+        release.set()
+
+
+def test_stale_low_priority_request_is_dropped():
+    scheduler = RequestScheduler(max_concurrent=1, reserved=0)
+    started = threading.Semaphore(0)
+    release = threading.Event()
+    try:
+        _hold(scheduler, c.PRIORITY_MARKET_DATA, started, release)
+        assert started.acquire(timeout=1)
+        assert scheduler.call(c.PRIORITY_MARKET_DATA, lambda: 'sent', deadline=0.05) is None
+        assert scheduler.stats()[c.PRIORITY_MARKET_DATA]['dropped'] == 1
+    finally:
+        release.set()
+
+
+class FakeTransport:
+    def get(self, url, params=None, headers=None):
+        return ReplayedResponse(200, json.dumps({'status_code' : 0, 'response' : [{'ticker' : 'GRC/AUD', 'market_id' : 1}]}))
+
+    def post(self, url, json=None, headers=None):
+        return ReplayedResponse(200, '{"status_code": 0, "response": {"trade_id": 11, "tx_id": "tx"}}')
+
+
+def test_trade_looks_up_an_uncached_market_as_an_order():
+    scheduler = RequestScheduler(max_concurrent=4, reserved=2, deadlines={})
+    started = threading.Semaphore(0)
+    release = threading.Event()
+    set_scheduler(scheduler)
+    set_transport(FakeTransport())
+    try:
+        for _ in range(2):
+            _hold(scheduler, c.PRIORITY_MARKET_DATA, started, release)
+        for _ in range(2):
+            assert started.acquire(timeout=1)
+
+        start = time()
+        status_code, response = Yora.API('token').trade('GRC/AUD', Yora.OrderType.BUY, 1, 0.5)
+        assert time() - start < 0.5
+        assert status_code == 0
+        assert response['trade_id'] == 11
+    finally:
+        release.set()
+        set_scheduler(None)
+        set_transport(None)
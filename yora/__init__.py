@@ -0,0 +1 @@
+"""Command line tools for the Yora library, run with python -m yora"""
@@ -0,0 +1,63 @@
+import os
+import sys
+import argparse
+
+import Yora
+from lib import constants as c
+from lib import export
+from lib.records import to_unixtime
+
+
+def parse_time(value):
+    return int(value) if value.isdigit() else int(to_unixtime(value))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m yora')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    exp = commands.add_parser('export', help='export candle and trade history, resuming any earlier run in the output directory')
+    exp.add_argument('markets', nargs='+', help="market tickers, eg. 'GRC/AUD'")
+    exp.add_argument('--token', default=os.environ.get('YORA_TOKEN'), help='API token, defaults to the YORA_TOKEN environment variable')
+    exp.add_argument('--intervals', nargs='+', type=int, default=[Yora.Times.HOUR.value], help='candle intervals in seconds')
+    exp.add_argument('--from', dest='from_time', type=parse_time, required=True, help='unix time or yyyy-mm-dd hh:mm:ss')
+    exp.add_argument('--to', dest='to_time', type=parse_time, default=None,
+                     help='unix time or yyyy-mm-dd hh:mm:ss, defaults to the end of the interrupted run in the output directory or now')
+    exp.add_argument('--format', choices=sorted(export.WRITERS), default='csv')
+    exp.add_argument('--out', default='export', help='output directory')
+    exp.add_argument('--no-trades', dest='trades', action='store_false', help='only export candles')
+    exp.add_argument('--workers', type=int, default=c.EXPORT_WORKERS)
+    exp.add_argument('--rate', type=float, default=c.EXPORT_RATE, help='maximum requests per second')
+    exp.add_argument('--chunk-size', type=int, default=c.EXPORT_CHUNK_SIZE, help='rows buffered per write')
+
+    args = parser.parse_args(argv)
+    if args.token is None:
+        parser.error('an API token is required, pass --token or set YORA_TOKEN')
+
+    try:
+        status_code, finished = export.export(
+            Yora.API(args.token),
+            args.markets,
+            args.intervals,
+            args.from_time,
+            args.to_time,
+            args.out,
+            fmt=args.format,
+            trades=args.trades,
+            workers=args.workers,
+            rate=args.rate,
+            chunk_size=args.chunk_size
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    if status_code != Yora.StatusCode.OK.value:
+        print('Export failed with status code ' + str(status_code))
+        return status_code
+    for key in finished:
+        print('Exported ' + key)
+    return status_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())